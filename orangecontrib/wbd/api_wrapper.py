@@ -4,125 +4,347 @@ This wrapper adds extra functionality to the IndicatorDataset class, for easier
 data manipulation and generating Orange data tables.
 """
 
+import json
+import calendar
 import datetime
-import time
 import logging
+import urllib.parse
+from itertools import chain
+from itertools import product
+from collections import defaultdict
+from collections import OrderedDict
+from collections import namedtuple
+from functools import lru_cache
 
 import numpy
 
 import Orange
 import simple_wbd
+from simple_wbd import utils
+from orangecontrib.wbd import cache
 from orangecontrib.wbd import countries
+from orangecontrib.wbd import transport
+from orangecontrib.wbd.fetching import FetchCancelled
+from orangecontrib.wbd.fetching import FetchProgress
+from orangecontrib.wbd.fetching import IndicatorBuffer
+from orangecontrib.wbd.fetching import SerialExecutor
 
 logger = logging.getLogger(__name__)
 
+IndicatorData = namedtuple("IndicatorData", ["rows", "columns", "X",
+                                             "metadata"])
+ClimateData = namedtuple("ClimateData", ["rows", "columns", "X"])
+RequestPlan = namedtuple("RequestPlan", ["countries", "per_page",
+                                         "country_filter"])
+
+
+def _get_executor(parallel):
+    """Get the shared transport executor, or a serial one."""
+    return transport.get_executor() if parallel else SerialExecutor()
+
+
+def _fill_array(shape, row_indexes, column_indexes, values):
+    """Scatter data points into a float array without empty columns.
+
+    Columns that do not contain any non zero values are dropped before the
+    array is allocated, so the result is the only full size allocation.
+
+    Args:
+        shape: tuple with the number of all rows and columns.
+        row_indexes: array of row indexes for every value.
+        column_indexes: array of column indexes for every value.
+        values: float array of data point values.
+
+    Returns:
+        tuple: C contiguous float64 array and the indexes of kept columns.
+    """
+    valid = ~numpy.isnan(values) & (values != 0)
+    non_empty = numpy.unique(column_indexes[valid])
+    new_indexes = numpy.full(shape[1], -1, dtype=int)
+    new_indexes[non_empty] = numpy.arange(len(non_empty))
+    column_indexes = new_indexes[column_indexes]
+    kept = column_indexes >= 0
+
+    data = numpy.full((shape[0], len(non_empty)), numpy.nan)
+    data[row_indexes[kept], column_indexes[kept]] = values[kept]
+    return data, non_empty
+
+
+@lru_cache(maxsize=4096)
+def _period_epoch(date_str):
+    """Get epoch seconds for a single wbd period string.
+
+    Returns:
+        int: UTC timestamp of the first day of the period, or None if the
+            period is not a valid date.
+    """
+    try:
+        if "Q" in date_str:
+            year, quarter = date_str.split("Q")
+            month = (int(quarter) * 3) - 2
+        elif "M" in date_str:
+            year, month = date_str.split("M")
+        else:
+            year, month = date_str, 1
+        return calendar.timegm(
+            datetime.date(int(year), int(month), 1).timetuple())
+    except ValueError:
+        # some dates contain invalid date strings such as
+        # "Last Known Value" or "1988-2000" and possible some more. See:
+        # http://api.worldbank.org/countries/PRY/indicators/
+        #   per_lm_ac.avt_q4_urb?date=1960%3A2016&format=json
+        #   &per_page=10000
+        # http://api.worldbank.org/countries/all/indicators/
+        #   DB_mw_19apprentice?format=json&mrv=10&gapfill=y
+        return None
+
+
+def dates_to_epoch(date_strings, invalid=numpy.nan):
+    """Convert wbd period strings to epoch seconds.
+
+    Convert date strings such as "2005", "2002Q3" and "1999M7" to UTC
+    timestamps of the first day of the period. Each distinct string is parsed
+    only once.
+
+    Args:
+        date_strings: array or list of period strings.
+        invalid: Value used for strings that are not valid periods.
+
+    Returns:
+        float array of timestamps.
+    """
+    periods, indexes = numpy.unique(numpy.asarray(date_strings, dtype=str),
+                                    return_inverse=True)
+    epochs = numpy.array([_period_epoch(p) for p in periods.tolist()],
+                         dtype=float)
+    epochs[numpy.isnan(epochs)] = invalid
+    return epochs[indexes]
+
+
+def encode_discrete(values):
+    """Encode values as indexes of their sorted unique categories.
+
+    Args:
+        values: array or list of strings. Empty strings are treated as missing
+            values.
+
+    Returns:
+        tuple: list of categories and a float array of category indexes, where
+            missing values are NaN.
+    """
+    categories, codes = numpy.unique(numpy.asarray(values, dtype=str),
+                                     return_inverse=True)
+    codes = codes.astype(float)
+    if len(categories) and categories[0] == "":
+        categories = categories[1:]
+        codes -= 1
+        codes[codes < 0] = numpy.nan
+    return categories.tolist(), codes
+
+
+def map_values(values, mapping):
+    """Map values with a dict, looking up each distinct value only once.
+
+    Values missing in the mapping are left unchanged.
+
+    Args:
+        values: array or list of strings.
+        mapping: dict with new values.
+
+    Returns:
+        numpy object array with mapped values.
+    """
+    categories, codes = numpy.unique(numpy.asarray(values, dtype=str),
+                                     return_inverse=True)
+    mapped = numpy.array([mapping.get(c, c) for c in categories.tolist()],
+                         dtype=object)
+    return mapped[codes]
+
+
+def _meta_array(columns, rows):
+    """Create an Orange metas array from a list of columns."""
+    metas = numpy.empty((rows, len(columns)), dtype=object)
+    for index, column in enumerate(columns):
+        metas[:, index] = column
+    return metas
+
 
 class IndicatorDataset(simple_wbd.IndicatorDataset):
     """Extended indicator dataset.
 
     This class extends the original indicator dataset by adding as_np_array and
     as_orange_table functions.
+
+    Data points are kept only in a numeric buffer, so api_responses are empty
+    and only numeric output (as_numeric, as_np_array and as_orange_table) is
+    supported.
     """
 
+    def __init__(self, api_responses, countries=None, buffer=None):
+        """Initialize dataset.
+
+        Args:
+            api_responses: dict of indicator ids and their data points. They
+                are added to the numeric buffer once and are not kept.
+            countries: list of country data used for metadata.
+            buffer: IndicatorBuffer with already ingested data. If set,
+                api_responses are ignored.
+        """
+        if buffer is None:
+            buffer = IndicatorBuffer(list(api_responses))
+            for indicator, data in api_responses.items():
+                buffer.add_page(indicator, data)
+        super().__init__(OrderedDict(), countries)
+        self._buffer = buffer
 
     @staticmethod
     def _get_iso_date(date_str):
-        """Convert wbd date string into iso format date string.
+        """Convert wbd date string into a date.
 
-        Convert date strings such as "2005", "2002Q3" and "1999M7" into iso
-        formatted date strings "yyyy-mm-dd"
+        Convert date strings such as "2005", "2002Q3" and "1999M7" into dates.
+        Invalid date strings are converted to the current date.
         """
-        try:
-            if "Q" in date_str:
-                year, quarter = date_str.split("Q")
-                return datetime.date(int(year), (int(quarter) * 3) - 2, 1)
-            elif "M" in date_str:
-                year, month = date_str.split("M")
-                return datetime.date(int(year), int(month), 1)
+        epoch = _period_epoch(date_str)
+        if epoch is None:
+            return datetime.date.today()
+        return datetime.datetime.utcfromtimestamp(epoch).date()
+
+    def _get_metadata(self, country_names):
+        """Get country metadata columns for the given countries.
+
+        Args:
+            country_names: list of country names as used in the data rows.
+
+        Returns:
+            OrderedDict: metadata column names mapped to numpy arrays. Latitude
+                and longitude are float arrays, all other arrays contain
+                strings.
+        """
+        metadata = OrderedDict()
+        country_data = [self.countries.get(name, {}) for name in country_names]
+        for key, name in self.METADATA_MAP.items():
+            values = [data.get(key) for data in country_data]
+            values = [v.get("value") if isinstance(v, dict) else v
+                      for v in values]
+            if key == "name":
+                metadata[name] = numpy.array(country_names, dtype=object)
+            elif key in ("longitude", "latitude"):
+                metadata[name] = numpy.array(
+                    [float(v) if v else None for v in values], dtype=float)
             else:
-                return datetime.date(int(date_str), 1, 1).isoformat()
-        except ValueError:
-            # some dates contain invalid date strings such as
-            # "Last Known Value" or "1988-2000" and possible some more. See:
-            # http://api.worldbank.org/countries/PRY/indicators/
-            #   per_lm_ac.avt_q4_urb?date=1960%3A2016&format=json
-            #   &per_page=10000
-            # http://api.worldbank.org/countries/all/indicators/
-            #   DB_mw_19apprentice?format=json&mrv=10&gapfill=y
-            return datetime.date.today().isoformat()
+                metadata[name] = numpy.array(
+                    [v or "" for v in values], dtype=object)
+        return metadata
+
+    def as_numeric(self, time_series=False, add_metadata=False):
+        """Get indicator data as a float array with separate labels.
+
+        The data array is filled directly from the ingested data points
+        without building intermediate lists. Missing values are NaN, and
+        columns that contain only missing or zero values are removed.
+
+        Args:
+            time_series: boolean indicating if rows should contain dates
+                instead of countries.
+            add_metadata: Add country metadata for all rows. This can only be
+                used if time_series is false.
+
+        Returns:
+            IndicatorData: row labels, column labels, 2D float64 data and
+                country metadata columns.
+        """
+        if add_metadata and time_series:
+            logger.info("Cannot add metadata to time series")
+            add_metadata = False
+
+        buffer = self._buffer
+        (indicators, indicator_indexes, country_labels, country_indexes,
+         date_labels, date_indexes, values) = buffer.get_points()
+
+        if time_series:
+            rows, row_indexes = date_labels, date_indexes
+            keys, key_indexes = country_labels, country_indexes
+        else:
+            rows, row_indexes = country_labels, country_indexes
+            keys, key_indexes = date_labels, date_indexes
+
+        # Each column is a unique indicator and date (or country) pair.
+        codes, column_indexes = numpy.unique(
+            indicator_indexes * len(keys) + key_indexes, return_inverse=True)
+        if len(buffer.indicators) > 1:
+            columns = ["{} - {}".format(indicators[code // len(keys)],
+                                        keys[code % len(keys)])
+                       for code in codes]
+        else:
+            columns = [keys[code % len(keys)] for code in codes]
+        columns = numpy.array(columns, dtype=str)
+        order = numpy.argsort(columns, kind="mergesort")
+        positions = numpy.empty_like(order)
+        positions[order] = numpy.arange(len(order))
+
+        data, non_empty = _fill_array((len(rows), len(columns)), row_indexes,
+                                      positions[column_indexes], values)
+        metadata = self._get_metadata(rows) if add_metadata else OrderedDict()
+        return IndicatorData(rows, columns[order][non_empty], data, metadata)
 
     def _time_series_table(self):
-        data = self.as_np_array(time_series=True)
+        data = self.as_numeric(time_series=True)
 
-        if not data.any():
+        if not data.X.size:
             return None
 
-        meta_columns = [[time.mktime(date_.timetuple()) if date_ else None]
-                        for date_ in data[1:, 0]]
-        data_columns = data[1:, 1:]
+        meta_columns = [dates_to_epoch(data.rows)]
 
         meta_domains = [Orange.data.TimeVariable("Date")]
 
         colum_domains = [Orange.data.ContinuousVariable(column_name)
-                         for column_name in data[0, 1:]]
+                         for column_name in data.columns]
 
-        logger.debug("Generated Orange table of size: %s", data.shape)
+        logger.debug("Generated Orange table of size: %s", data.X.shape)
 
         domain = Orange.data.Domain(colum_domains, metas=meta_domains)
-        return Orange.data.Table(domain, data_columns, metas=meta_columns)
+        return Orange.data.Table.from_numpy(
+            domain, data.X, metas=_meta_array(meta_columns, len(data.rows)))
 
     def _country_table(self):
-        data = self.as_np_array(add_metadata=True)
+        data = self.as_numeric(add_metadata=True)
 
-        if not data.any():
+        if not data.X.size:
             return None
 
-        meta_columns = data[1:, :7]
-
-        data_columns = data[1:, 7:]
-
-        regions = {r:i for i,r in enumerate(sorted(set(meta_columns[:,1])))}
-        admin_regions = {r:i for i,r in enumerate(sorted(set(meta_columns[:,2])))}
-        income_level = {r:i for i,r in enumerate(sorted(set(meta_columns[:,3])))}
-        lending_type = {r:i for i,r in enumerate(sorted(set(meta_columns[:,6])))}
-
-        meta_domains = [
-          Orange.data.StringVariable("Country"),
-          Orange.data.DiscreteVariable(
-            "Region",
-            values=sorted(regions.keys())
-          ),
-          Orange.data.DiscreteVariable(
-            "Admin region",
-            values=sorted(admin_regions.keys())
-          ),
-          Orange.data.DiscreteVariable(
-            "Income level",
-            values=sorted(income_level.keys())
-          ),
-          Orange.data.ContinuousVariable("Longitude"),
-          Orange.data.ContinuousVariable("Latitude"),
-          Orange.data.DiscreteVariable(
-            "Lending type",
-            values=sorted(lending_type.keys())
-          ),
-        ]
+        discrete_columns = ["Region", "Admin region", "Income level",
+                            "Lending type"]
+        meta_domains = []
+        meta_columns = []
+        for name, values in data.metadata.items():
+            if name in discrete_columns:
+                categories, codes = encode_discrete(values)
+                meta_domains.append(
+                    Orange.data.DiscreteVariable(name, values=categories))
+                meta_columns.append(codes)
+            elif values.dtype == float:
+                meta_domains.append(Orange.data.ContinuousVariable(name))
+                meta_columns.append(values)
+            else:
+                meta_domains.append(Orange.data.StringVariable(name))
+                meta_columns.append(values)
+
         colum_domains = [Orange.data.ContinuousVariable(column_name)
-                         for column_name in data[0, 7:]]
-        for row in meta_columns:
-          row[1] = regions[row[1]]
-          row[2] = admin_regions[row[2]]
-          row[3] = income_level[row[3]]
-          row[6] = lending_type[row[6]]
+                         for column_name in data.columns]
 
-        logger.debug("Generated Orange table of size: %s", data.shape)
+        logger.debug("Generated Orange table of size: %s", data.X.shape)
 
         domain = Orange.data.Domain(colum_domains, metas=meta_domains)
-        return Orange.data.Table(domain, data_columns, metas=meta_columns)
+        return Orange.data.Table.from_numpy(
+            domain, data.X, metas=_meta_array(meta_columns, len(data.rows)))
 
-    def as_np_array(self, time_series=False, add_metadata=False, **kwargs):
+    def as_np_array(self, time_series=False, add_metadata=False):
         """Get a 2D numpy array data representation.
 
+        The first row contains headers and the first column countries or
+        dates, followed by metadata columns if add_metadata is set. For
+        numerical processing use as_numeric instead.
+
         Args:
             time_series: boolean indicating if the first column should contain
                 countries or dates. Different indicators are always in columns
@@ -133,15 +355,28 @@ class IndicatorDataset(simple_wbd.IndicatorDataset):
                 latitude, longitude, and Lending type.
 
         Returns:
-            2D numpy array with all indicator data.
+            2D numpy object array with all indicator data.
         """
-        data = numpy.array(self.as_list(time_series=time_series,
-                                        add_metadata=add_metadata,
-                                        **kwargs))
+        data = self.as_numeric(time_series=time_series,
+                               add_metadata=add_metadata)
+        if data.metadata:
+            headers = list(data.metadata)
+            labels = list(data.metadata.values())
+        elif time_series:
+            headers = ["Date"]
+            labels = [[utils.parse_wb_date(date_str)
+                       for date_str in data.rows]]
+        else:
+            headers = ["Country"]
+            labels = [data.rows]
 
-        # list of column indexes that have at least one non zero value
-        filter_ = [ind for ind, col in enumerate(data[1:, :].T) if any(col)]
-        return data[:, filter_]
+        array = numpy.empty((len(data.rows) + 1,
+                             len(headers) + len(data.columns)), dtype=object)
+        array[0] = headers + data.columns.tolist()
+        for index, label_column in enumerate(labels):
+            array[1:, index] = label_column
+        array[1:, len(headers):] = data.X
+        return array
 
     def as_orange_table(self, time_series=False):
         if time_series:
@@ -151,10 +386,316 @@ class IndicatorDataset(simple_wbd.IndicatorDataset):
 
 
 class IndicatorAPI(simple_wbd.IndicatorAPI):
-    """Wrapper for Indicator API to use the extended data set."""
+    """Wrapper for Indicator API to use the extended data set.
+
+    Indicator data pages are stored in a persistent response cache, keyed by
+    the indicator, the set of requested countries and the page number.
+    Indicators and their pages are fetched concurrently.
+
+    Requests are planned per dataset: selected countries are joined into a
+    single request, or replaced with "all" and filtered locally when the
+    selection covers most countries, and the page size is chosen so that
+    most indicators fit on one page.
+
+    Fetch progress is only reported to the progress_callback of get_dataset.
+    The progress dict of simple_wbd is not updated.
+    """
+
+    INDICATOR_PARAMS = "?format=json&per_page={per_page}"
+    # Use "all" countries if more than this part of them is selected.
+    ALL_COUNTRIES_RATIO = 0.5
+    # Max number of country codes in a request url.
+    MAX_COUNTRY_CODES = 200
+    # Page size is a multiple of MIN_PER_PAGE.
+    MIN_PER_PAGE = 1000
+    MAX_PER_PAGE = 20000
+    FIRST_YEAR = 1960
 
-    def __init__(self):
+    def __init__(self, parallel=True):
+        """Initialize indicator api.
+
+        Args:
+            parallel: If True, pages are fetched in the shared transport
+                executor, which is bounded by transport.FETCH_THREADS.
+                Otherwise they are fetched sequentially in the calling
+                thread. The number of open connections is also limited per
+                host by the transport module.
+        """
         super().__init__(IndicatorDataset)
+        self.cache = cache.get_cache("indicators")
+        self.parallel = parallel
+
+    def get_countries(self):
+        """Get a list of countries and regions.
+
+        The list is shared with the country tree widgets and is fetched at
+        most once per catalog expiry time. See
+        simple_wbd.IndicatorAPI.get_countries for more info.
+        """
+        return countries.get_country_catalog()
+
+    def get_indicators(self, filter_="Common"):
+        """Get a list of indicators with the shared transport.
+
+        The full list is kept in the response cache. See
+        simple_wbd.IndicatorAPI.get_indicators for more info.
+        """
+        key = cache.normalize_key("indicator_list")
+        indicators = self.cache.get(key)
+        if indicators is None:
+            url = urllib.parse.urljoin(self.BASE_URL,
+                                       "indicators" + self.GET_PARAMS)
+            indicators = transport.fetch_json(
+                url, priority=transport.INTERACTIVE)[1]
+            self.cache.set(key, indicators)
+        if filter_:
+            return self._filter_indicators(indicators, filter_)
+        return indicators
+
+    def _plan_request(self, alpha3_codes):
+        """Plan country codes and page size for indicator requests.
+
+        Each request url contains either all selected country codes or
+        "all". With "all", data points of countries that were not selected
+        are dropped from every page. The page size is estimated from the
+        number of countries and years, so that a complete indicator usually
+        needs a single request.
+
+        Args:
+            alpha3_codes: set of lower case alpha3 codes of selected
+                countries. If empty, all countries are used.
+
+        Returns:
+            RequestPlan: countries url part, page size and a set of lower case
+                country ids and names to keep, or None to keep all data.
+        """
+        catalog = self.get_countries()
+        count = len(alpha3_codes)
+        country_filter = None
+        if (not alpha3_codes or count > self.MAX_COUNTRY_CODES or
+                count > len(catalog) * self.ALL_COUNTRIES_RATIO):
+            countries_text = "all"
+            if alpha3_codes:
+                country_filter = frozenset(
+                    value.lower()
+                    for country in catalog
+                    if country.get("id", "").lower() in alpha3_codes
+                    for value in (country.get("iso2Code"), country.get("id"),
+                                  country.get("name"))
+                    if value
+                )
+            count = max(len(catalog), count)
+        else:
+            countries_text = ";".join(sorted(alpha3_codes)).upper()
+
+        years = datetime.date.today().year - self.FIRST_YEAR + 1
+        pages = -(-count * years // self.MIN_PER_PAGE)
+        per_page = min(max(pages, 1) * self.MIN_PER_PAGE, self.MAX_PER_PAGE)
+        return RequestPlan(countries_text, per_page, country_filter)
+
+    @staticmethod
+    def _filter_points(points, country_filter):
+        """Keep data points of selected countries.
+
+        Args:
+            points: list of indicator data points.
+            country_filter: set of lower case country ids and names, or None.
+
+        Returns:
+            list[dict]: data points with a matching country id or name.
+        """
+        if country_filter is None:
+            return points
+        filtered = []
+        for point in points:
+            country = point.get("country") or {}
+            if ((country.get("id") or "").lower() in country_filter or
+                    (country.get("value") or "").lower() in country_filter):
+                filtered.append(point)
+        return filtered
+
+    def _get_page(self, plan, indicator, page=1, fetch=None):
+        """Get a single page of indicator data.
+
+        Pages are cached separately so that they can be streamed into a
+        buffer without keeping the whole indicator response in memory.
+
+        Args:
+            plan: RequestPlan with requested countries and page size.
+            indicator: Indicator id.
+            page: Page number.
+            fetch: Optional FetchProgress that counts downloaded bytes.
+
+        Returns:
+            tuple: number of all pages and list of data points on this page.
+        """
+        key = cache.normalize_key("indicator", indicator,
+                                  plan.countries.split(";"), plan.per_page,
+                                  page)
+        response_json = self.cache.get(key)
+        if response_json is None:
+            query = "countries/{countries}/indicators/{indicator}{params}"
+            query = query.format(
+                countries=plan.countries,
+                indicator=indicator,
+                params=self.INDICATOR_PARAMS.format(per_page=plan.per_page),
+            )
+            url = "{url}&page={page}".format(
+                url=urllib.parse.urljoin(self.BASE_URL, query),
+                page=page,
+            )
+            response_text = transport.fetch(url)
+            if fetch is not None:
+                fetch.add_bytes(len(response_text.encode("utf-8")))
+            response_json = json.loads(response_text)
+            header = response_json[0] if response_json else {}
+            # Do not cache error messages.
+            if "pages" in header:
+                self.cache.set(key, response_json)
+        else:
+            logger.debug("Using cached page %s for indicator: %s", page,
+                         indicator)
+
+        header = response_json[0] if response_json else {}
+        page_data = []
+        if len(response_json) > 1:
+            page_data = response_json[1] or []
+        page_data = self._filter_points(page_data, plan.country_filter)
+        return header.get("pages", 1), page_data
+
+    def _fetch_page(self, plan, indicator, page, fetch, buffer=None):
+        fetch.check_cancelled()
+        _, page_data = self._get_page(plan, indicator, page, fetch)
+        fetch.update(indicator, rows=len(page_data))
+        if buffer is not None:
+            buffer.add_page(indicator, page_data, page)
+            return []
+        return page_data
+
+    def _fetch_first_page(self, plan, indicator, fetch, buffer=None):
+        """Fetch the first page of an indicator.
+
+        Returns:
+            tuple: number of all pages and list of data points on the first
+                page, or an empty list if the page was added to the buffer.
+        """
+        fetch.check_cancelled()
+        pages, page_data = self._get_page(plan, indicator, fetch=fetch)
+        fetch.update(indicator, total=pages, rows=len(page_data))
+        if buffer is not None:
+            buffer.add_page(indicator, page_data)
+            return pages, []
+        return pages, page_data
+
+    @staticmethod
+    def _indicator_results(indicator, futures, buffer=None):
+        """Get results of indicator page futures.
+
+        Args:
+            indicator: Indicator id.
+            futures: list of futures for fetched pages.
+            buffer: Optional IndicatorBuffer.
+
+        Returns:
+            list: Results of all futures, or None if any of them failed.
+
+        Raises:
+            FetchCancelled: If the fetch was cancelled.
+        """
+        # pylint: disable=broad-except
+        try:
+            return [future.result() for future in futures]
+        except FetchCancelled:
+            raise
+        except Exception:
+            # We should avoid any errors that can occur due to api
+            # responses or invalid data.
+            logger.warning("Failed to fetch indicator: %s", indicator,
+                           exc_info=True)
+            if buffer is not None:
+                buffer.discard(indicator)
+        return None
+
+    def get_dataset(self, indicators, countries=None, streaming=False,
+                    cancelled=None, progress_callback=None):
+        """Get indicator dataset.
+
+        Indicators and their pages are fetched concurrently, but the results
+        are always assembled in the order of requested indicators and pages.
+        First pages of all indicators are fetched before the remaining
+        pages, so that no fetching thread waits for another one.
+
+        Progress events count fetched indicators, where each partially
+        fetched indicator counts as the fraction of its fetched pages.
+
+        Args:
+            indicators (str or list[str]): A single indicator id, or a list of
+                requested indicator ids.
+            countries (str or list[str]): country id or list of country ids. If
+                None, all countries will be used.
+            streaming (bool): Add every page directly into a numeric buffer
+                while fetching. Otherwise data points of each indicator are
+                collected first and added to the buffer of the returned
+                dataset.
+            cancelled: Optional threading.Event. When it is set, pages that
+                have not been requested yet are skipped and FetchCancelled is
+                raised.
+            progress_callback: Optional function that receives a
+                ProgressEvent after every fetched page. It is called from
+                fetching threads.
+
+        Returns:
+            IndicatorDataset: all datasets for the requested indicators.
+
+        Raises:
+            FetchCancelled: If the cancelled event was set.
+        """
+        if isinstance(indicators, str):
+            indicators = [indicators]
+
+        plan = self._plan_request(self._countries_to_alpha3(countries))
+        logger.debug("Indicator request plan: %s countries, %s per page",
+                     plan.countries[:50], plan.per_page)
+
+        indicators = list(OrderedDict.fromkeys(i.lower() for i in indicators))
+        fetch = FetchProgress(len(indicators), cancelled, progress_callback)
+        buffer = IndicatorBuffer(indicators) if streaming else None
+
+        executor = _get_executor(self.parallel)
+        first_pages = [
+            (indicator, executor.submit(self._fetch_first_page, plan,
+                                        indicator, fetch, buffer))
+            for indicator in indicators
+        ]
+        page_futures = OrderedDict()
+        try:
+            for indicator, future in first_pages:
+                results = self._indicator_results(indicator, [future], buffer)
+                if results is None:
+                    continue
+                pages, page_data = results[0]
+                page_futures[indicator] = (page_data, [
+                    executor.submit(self._fetch_page, plan, indicator, page,
+                                    fetch, buffer)
+                    for page in range(2, pages + 1)
+                ])
+
+            responses = OrderedDict()
+            for indicator, (page_data, futures) in page_futures.items():
+                results = self._indicator_results(indicator, futures, buffer)
+                if results is not None and not streaming:
+                    responses[indicator] = page_data + list(
+                        chain.from_iterable(results))
+        finally:
+            # Skip pages that were not started if the fetch failed.
+            for _, future in first_pages:
+                future.cancel()
+            for _, futures in page_futures.values():
+                for future in futures:
+                    future.cancel()
+
+        return self._dataset_class(responses, self.get_countries(),
+                                   buffer=buffer)
 
 
 class ClimateDataset(simple_wbd.ClimateDataset):
@@ -177,47 +718,112 @@ class ClimateDataset(simple_wbd.ClimateDataset):
         filter_ = [ind for ind, col in enumerate(data[1:, :].T) if any(col)]
         return data[:, filter_]
 
-    def _country_table(self, **kwargs):
-        data = self.as_np_array(**kwargs)
-        if data.shape[0] < 2:
+    def _get_data_points(self):
+        """Get all data points from api responses.
+
+        Returns:
+            list[tuple]: country, data type, interval, interval key and value
+                for every data point.
+        """
+        points = []
+        for country, country_dict in self.api_responses.items():
+            for type_, type_dict in country_dict.items():
+                for interval, interval_dict in type_dict.items():
+                    time_key = self._time_key_map.get(interval, interval)
+                    for value in interval_dict.get("response", []):
+                        points.append((country, type_, interval,
+                                       value[time_key], value["data"]))
+        return points
+
+    @staticmethod
+    def _index_keys(keys):
+        """Get sorted unique keys and an index array for all keys."""
+        unique_keys = sorted(set(keys))
+        key_map = {key: index for index, key in enumerate(unique_keys)}
+        return unique_keys, numpy.array([key_map[key] for key in keys],
+                                        dtype=int)
+
+    @staticmethod
+    def _interval_epochs(rows):
+        """Get epoch seconds for (interval, key) time series rows.
+
+        Only yearly intervals can be represented as dates, month rows are NaN.
+        """
+        return dates_to_epoch([
+            str(key) if interval in ("year", "decade") else ""
+            for interval, key in rows
+        ])
+
+    def as_numeric(self, time_series=False, use_names=False):
+        """Get climate data as a float array with separate labels.
+
+        Args:
+            time_series: If True, rows contain intervals and columns contain
+                countries and data types. Otherwise rows contain countries and
+                columns data types and intervals.
+            use_names: Use country names instead of alpha3 codes in column
+                labels.
+
+        Returns:
+            ClimateData: row keys, column labels and 2D float64 data. Row keys
+                are alpha3 codes for country rows, and (interval, key) tuples
+                for time series rows.
+        """
+        points = self._get_data_points()
+        if time_series:
+            row_keys = [(p[2], p[3]) for p in points]
+            column_keys = [(p[0], p[1]) for p in points]
+        else:
+            row_keys = [p[0] for p in points]
+            column_keys = [p[1:4] for p in points]
+        values = numpy.array([p[4] for p in points], dtype=float)
+
+        rows, row_indexes = self._index_keys(row_keys)
+        columns, column_indexes = self._index_keys(column_keys)
+        data, non_empty = _fill_array((len(rows), len(columns)), row_indexes,
+                                      column_indexes, values)
+
+        alpha3_map = countries.get_alpha3_map() if use_names else {}
+        labels = []
+        for index in non_empty:
+            key = list(columns[index])
+            if time_series:
+                key[0] = alpha3_map.get(key[0], key[0])
+            labels.append(self._join(key))
+
+        return ClimateData(rows, labels, data)
+
+    def _country_table(self, use_names=False):
+        data = self.as_numeric(use_names=use_names)
+        if not data.rows:
             return None
-        alpha3_map = countries.get_alpha3_map()
-        meta_columns = data[1:, :1]
-        data_columns = data[1:, 1:]
-        for row in meta_columns:
-            row[0] = alpha3_map.get(row[0], row[0])
-
-        meta_domains = [Orange.data.StringVariable(name)
-                        for name in data[0, :1]]
+        meta_columns = [map_values(data.rows, countries.get_alpha3_map())]
+
+        meta_domains = [Orange.data.StringVariable("country")]
         colum_domains = [Orange.data.ContinuousVariable(column_name)
-                         for column_name in data[0, 1:]]
+                         for column_name in data.columns]
 
-        logger.debug("Generated Orange table of size: %s", data.shape)
+        logger.debug("Generated Orange table of size: %s", data.X.shape)
 
         domain = Orange.data.Domain(colum_domains, metas=meta_domains)
-        return Orange.data.Table(domain, data_columns, metas=meta_columns)
+        return Orange.data.Table.from_numpy(
+            domain, data.X, metas=_meta_array(meta_columns, len(data.rows)))
 
-    def _time_series_table(self, **kwargs):
-        data = self.as_np_array(columns=["country", "type"], use_dates=True,
-                                **kwargs)
-        if data.shape[0] < 2:
+    def _time_series_table(self, use_names=False):
+        data = self.as_numeric(time_series=True, use_names=use_names)
+        if not data.rows:
             return None
-        alpha3_map = countries.get_alpha3_map()
-        meta_columns = [[time.mktime(date_.timetuple()) if date_ else None]
-                        for date_ in data[1:, 0]]
-        data_columns = data[1:, 1:]
-        for row in meta_columns:
-            row[0] = alpha3_map.get(row[0], row[0])
-
-        meta_domains = [Orange.data.TimeVariable(name)
-                        for name in data[0, :1]]
+        meta_columns = [self._interval_epochs(data.rows)]
+
+        meta_domains = [Orange.data.TimeVariable("interval")]
         colum_domains = [Orange.data.ContinuousVariable(column_name)
-                         for column_name in data[0, 1:]]
+                         for column_name in data.columns]
 
-        logger.debug("Generated Orange table of size: %s", data.shape)
+        logger.debug("Generated Orange table of size: %s", data.X.shape)
 
         domain = Orange.data.Domain(colum_domains, metas=meta_domains)
-        return Orange.data.Table(domain, data_columns, metas=meta_columns)
+        return Orange.data.Table.from_numpy(
+            domain, data.X, metas=_meta_array(meta_columns, len(data.rows)))
 
     def as_orange_table(self, time_series=False, **kwargs):
         if time_series:
@@ -227,10 +833,125 @@ class ClimateDataset(simple_wbd.ClimateDataset):
 
 
 class ClimateAPI(simple_wbd.ClimateAPI):
-    """Wrapper for Climate API to use the extended data set."""
-    # pylint: disable=too-few-public-methods
-    # This is just an extension of the returned dataset. We do not need to add
-    # any additional functions here.
+    """Wrapper for Climate API to use the extended data set.
+
+    Responses for every location, data type and interval combination are
+    stored in a persistent response cache, and missing responses are fetched
+    concurrently.
+
+    Fetch progress is only reported to the progress_callback of
+    get_instrumental. The progress dict of simple_wbd is not updated.
+    """
 
-    def __init__(self):
+    def __init__(self, parallel=True):
+        """Initialize climate api.
+
+        Args:
+            parallel: If True, requests are fetched in the shared transport
+                executor. Otherwise they are fetched sequentially in the
+                calling thread.
+        """
         super().__init__(ClimateDataset)
+        self.cache = cache.get_cache("climate")
+        self.parallel = parallel
+
+    def _get_instrumental_data(self, location, data_type, interval,
+                               fetch=None):
+        """Get a single instrumental data response.
+
+        Args:
+            location: Alpha3 country code or basin id.
+            data_type: "pr" or "tas".
+            interval: "year", "month" or "decade".
+            fetch: Optional FetchProgress that counts downloaded bytes.
+
+        Returns:
+            dict: url and json response for the given parameters.
+        """
+        loc_type, location = self._get_location(location)
+        key = cache.normalize_key("instrumental", location, data_type,
+                                  interval)
+        response = self.cache.get(key)
+        if response is None:
+            query = self.INSTRUMENTAL_QUERY.format(
+                loc_type=loc_type,
+                data_type=data_type,
+                interval=interval,
+                location=location,
+            )
+            url = self.BASE_URL + query
+            response_text = transport.fetch(url)
+            if fetch is not None:
+                fetch.add_bytes(len(response_text.encode("utf-8")))
+            response = {
+                "url": url,
+                "response": json.loads(response_text),
+            }
+            # Do not cache error messages.
+            if isinstance(response["response"], list):
+                self.cache.set(key, response)
+        return response
+
+    def _get_request_data(self, request, fetch):
+        fetch.check_cancelled()
+        try:
+            response = self._get_instrumental_data(*request, fetch=fetch)
+        except Exception:
+            # Failed requests are finished too.
+            fetch.update(request)
+            raise
+        data = response.get("response")
+        fetch.update(request, rows=len(data) if isinstance(data, list) else 0)
+        return response
+
+    def get_instrumental(self, locations, data_types=None, intervals=None,
+                         cancelled=None, progress_callback=None):
+        """Get historical data for temperature or precipitation.
+
+        All location, data type and interval combinations are fetched
+        concurrently. Failed requests are logged and left out of the returned
+        dataset. If the optional cancelled threading.Event is set, requests
+        that have not started yet are skipped and FetchCancelled is raised.
+        The optional progress_callback receives a ProgressEvent after every
+        finished request.
+
+        See simple_wbd.ClimateAPI.get_instrumental for more info.
+
+        Returns:
+            ClimateDataset: Dataset for all locations, data types and
+                intervals.
+        """
+        if not data_types:
+            data_types = self.INSTRUMENTAL_TYPES
+        if not intervals:
+            intervals = self._default_intervals
+
+        # Resolve locations before fetching so invalid ones fail immediately.
+        locations = [self._get_location(location)[1]
+                     for location in locations]
+        parameters = list(product(locations, data_types, intervals))
+        fetch = FetchProgress(len(parameters), cancelled, progress_callback)
+
+        api_responses = defaultdict(lambda: defaultdict(dict))
+        executor = _get_executor(self.parallel)
+        futures = [(request, executor.submit(self._get_request_data,
+                                             request, fetch))
+                   for request in parameters]
+        # pylint: disable=broad-except
+        try:
+            for (location, data_type, interval), future in futures:
+                try:
+                    api_responses[location][data_type][interval] = \
+                        future.result()
+                except FetchCancelled:
+                    raise
+                except Exception:
+                    logger.warning("Failed to fetch climate data for: %s %s "
+                                   "%s", location, data_type, interval,
+                                   exc_info=True)
+        finally:
+            # Skip requests that were not started if the fetch failed.
+            for _, future in futures:
+                future.cancel()
+
+        return self._dataset_class(api_responses)
@@ -0,0 +1,227 @@
+"""Persistent cache for World Bank API responses.
+
+Responses are stored as json files in the Orange cache directory, so that they
+survive between Orange sessions. Each cache entry is keyed by a normalized
+request description instead of the raw url, so that requests that only differ
+in the order of their countries or indicators share the same entry.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import collections
+
+from Orange.misc import environ
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIME = 60 * 60 * 24  # one day in seconds
+MAX_SIZE = 500 * 1024 * 1024  # 500 MB
+
+
+def normalize_key(*parts):
+    """Generate a hashable string key from request parameters.
+
+    Sets, lists and tuples are sorted and lower cased, so that the same request
+    with differently ordered countries or indicators produces the same key.
+
+    Args:
+        parts: Any json serializable values or collections of strings.
+
+    Returns:
+        str: hex digest that can be used as a file name.
+    """
+    normalized = []
+    for part in parts:
+        if isinstance(part, (set, frozenset, list, tuple)):
+            part = sorted(str(item).lower() for item in part)
+        elif isinstance(part, str):
+            part = part.lower()
+        normalized.append(part)
+    key_text = json.dumps(normalized, sort_keys=True)
+    return hashlib.sha1(key_text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(object):
+    """Disk backed key value store with TTL expiry and LRU eviction.
+
+    Entries are kept as separate files in the cache directory. The file
+    modification time is used as the last access time for LRU eviction, and the
+    creation time is stored inside the entry itself for TTL expiry.
+
+    The lock only guards the in memory entry list and statistics. Files are
+    read and written outside of it, so concurrent requests do not wait for
+    each other's disk access. Files are replaced atomically, so a reader
+    never sees a partially written entry.
+    """
+
+    def __init__(self, name, ttl=CACHE_TIME, max_size=MAX_SIZE,
+                 cache_dir=None):
+        """Initialize cache.
+
+        Args:
+            name: Name of the cache sub directory.
+            ttl: Number of seconds an entry is valid.
+            max_size: Max number of bytes all entries can take on disk. When
+                the limit is exceeded, the least recently used entries are
+                removed.
+            cache_dir: Base directory for cache files. Defaults to the Orange
+                cache directory.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._directory = os.path.join(
+            cache_dir or environ.cache_dir(), "wbd", name)
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._load_entries()
+
+    def _load_entries(self):
+        """Read existing cache entries ordered by their last access time."""
+        os.makedirs(self._directory, exist_ok=True)
+        entries = []
+        for file_name in os.listdir(self._directory):
+            path = os.path.join(self._directory, file_name)
+            if not file_name.endswith(".json"):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, file_name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+
+    def _path(self, key):
+        return os.path.join(self._directory, key + ".json")
+
+    def _remove(self, key):
+        size = self._entries.pop(key, 0)
+        self._size -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            logger.debug("Cache file already removed: %s", key)
+
+    def _evict(self):
+        while self._size > self.max_size and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            logger.debug("Evicting cache entry: %s", key)
+            self._remove(key)
+
+    def get(self, key, default=None):
+        """Get a cached value.
+
+        Args:
+            key: Key generated with normalize_key.
+            default: Value returned if the key is missing or expired.
+
+        Returns:
+            Cached value or default.
+        """
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+
+        try:
+            with open(path, "rb") as file_:
+                entry = json.loads(file_.read().decode("utf-8"))
+        except FileNotFoundError:
+            # The entry was removed by another thread or outside of Orange.
+            with self._lock:
+                if key in self._entries and not os.path.exists(path):
+                    self._size -= self._entries.pop(key)
+                self.misses += 1
+            return default
+        except (OSError, ValueError):
+            logger.warning("Invalid cache entry: %s", key, exc_info=True)
+            entry = None
+
+        with self._lock:
+            if (entry is None or
+                    time.time() - entry.get("created", 0) > self.ttl):
+                logger.debug("Removing cache entry: %s", key)
+                self._remove(key)
+                self.misses += 1
+                return default
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            logger.debug("Cache file already removed: %s", key)
+        return entry.get("value")
+
+    def set(self, key, value):
+        """Store a json serializable value in the cache.
+
+        Args:
+            key: Key generated with normalize_key.
+            value: Json serializable value.
+        """
+        entry = json.dumps({"created": time.time(), "value": value})
+        entry = entry.encode("utf-8")
+        path = self._path(key)
+        temp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(temp_path, "wb") as file_:
+            file_.write(entry)
+        with self._lock:
+            os.replace(temp_path, path)
+            self._size += len(entry) - self._entries.pop(key, 0)
+            self._entries[key] = len(entry)
+            self._evict()
+
+    def clear(self):
+        """Remove all cache entries."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self):
+        """Get cache usage statistics."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "size": self._size,
+            }
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(name, ttl=CACHE_TIME):
+    """Get a shared cache instance.
+
+    All API instances should use the same cache object for the same name, so
+    that the in memory LRU order and size stay in sync with the files on disk.
+
+    Args:
+        name: Name of the cache.
+        ttl: Expiry time used if the cache instance does not exist yet.
+    """
+    with _CACHES_LOCK:
+        if name not in _CACHES:
+            _CACHES[name] = ResponseCache(name, ttl=ttl)
+        return _CACHES[name]
+
+
+def get_snapshot_cache():
+    """Get the cache for last known API responses.
+
+    Snapshots never expire. They are used for showing data immediately while
+    fresh data is fetched in the background.
+    """
+    return get_cache("snapshots", ttl=float("inf"))
@@ -0,0 +1,282 @@
+"""Local catalog of World Bank indicators.
+
+Indicator descriptions are stored in an SQLite database in the Orange cache
+directory, with a full text index over their id, name, source, description,
+organization and topics. This makes it possible to search all indicators
+without downloading and filtering the whole indicator list.
+
+If the SQLite library was built without FTS5, search falls back to plain
+substring matching.
+"""
+
+import os
+import re
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+
+from Orange.misc import environ
+
+from orangecontrib.wbd import api_wrapper
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["id", "name", "source", "source_note", "organization", "topics"]
+
+# bm25 weights for COLUMNS, matches in ids and names rank first.
+RANK_WEIGHTS = [10.0, 5.0, 1.0, 1.0, 1.0, 2.0]
+
+
+def _indicator_row(indicator):
+    """Get catalog column values for an indicator."""
+    return [
+        indicator.get("id", "").strip(),
+        indicator.get("name", "").strip(),
+        (indicator.get("source") or {}).get("value", "").strip(),
+        (indicator.get("sourceNote") or "").strip(),
+        (indicator.get("sourceOrganization") or "").strip(),
+        ", ".join(
+            topic.get("value", "").strip()
+            for topic in indicator.get("topics") or []
+        ),
+    ]
+
+
+class IndicatorCatalog(object):
+    """SQLite backed indicator catalog with full text search.
+
+    A new connection is used for every operation, so a catalog can be shared
+    between threads.
+    """
+
+    def __init__(self, path=None):
+        """Open or create the catalog database.
+
+        Args:
+            path: Database file name. Defaults to a file in the Orange cache
+                directory.
+        """
+        if path is None:
+            directory = os.path.join(environ.cache_dir(), "wbd")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, "indicators.sqlite")
+        self.path = path
+        self._lock = threading.Lock()
+        self.has_fts = self._create_tables()
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path))
+
+    def _create_tables(self):
+        """Create catalog tables.
+
+        If the full text index is created for an existing catalog, for
+        example one that was filled without FTS5, all stored indicators are
+        indexed.
+
+        Returns:
+            bool: True if the full text index is available.
+        """
+        with self._connect() as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS indicators ("
+                "{}, data TEXT)".format(
+                    ", ".join(
+                        "{} TEXT{}".format(
+                            col, " UNIQUE NOT NULL" if col == "id" else "")
+                        for col in COLUMNS)))
+            has_index = conn.execute(
+                "SELECT count(*) FROM sqlite_master "
+                "WHERE name = 'indicators_fts'").fetchone()[0]
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS indicators_fts "
+                    "USING fts5({})".format(", ".join(COLUMNS)))
+            except sqlite3.OperationalError:
+                logger.warning("SQLite FTS5 is not available, indicator "
+                               "search will be slower.")
+                return False
+            if not has_index:
+                conn.execute(
+                    "INSERT INTO indicators_fts (rowid, {columns}) "
+                    "SELECT rowid, {columns} FROM indicators".format(
+                        columns=", ".join(COLUMNS)))
+        return True
+
+    def __len__(self):
+        with self._connect() as conn:
+            query = "SELECT count(*) FROM indicators"
+            return conn.execute(query).fetchone()[0]
+
+    def update(self, indicators, remove_missing=False):
+        """Add new and changed indicators to the catalog.
+
+        Args:
+            indicators: list of indicator dicts as returned by the indicators
+                API.
+            remove_missing: Remove indicators that are not in the given list.
+                This should only be used with the complete indicator list.
+
+        Returns:
+            dict: number of added, updated and removed indicators.
+        """
+        new_data = {}
+        for indicator in indicators:
+            if indicator.get("id"):
+                new_data[indicator["id"].strip()] = json.dumps(
+                    indicator, sort_keys=True)
+
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        with self._lock, self._connect() as conn, conn:
+            existing = {
+                id_: (rowid, data) for rowid, id_, data in
+                conn.execute("SELECT rowid, id, data FROM indicators")
+            }
+            for id_, data in new_data.items():
+                rowid, old_data = existing.get(id_, (None, None))
+                if old_data == data:
+                    continue
+                values = _indicator_row(json.loads(data))
+                if rowid is None:
+                    cursor = conn.execute(
+                        "INSERT INTO indicators VALUES ({})".format(
+                            ", ".join("?" * (len(COLUMNS) + 1))),
+                        values + [data])
+                    rowid = cursor.lastrowid
+                    counts["added"] += 1
+                else:
+                    conn.execute(
+                        "UPDATE indicators SET {}, data = ? "
+                        "WHERE rowid = ?".format(
+                            ", ".join("{} = ?".format(col)
+                                      for col in COLUMNS)),
+                        values + [data, rowid])
+                    self._remove_from_index(conn, rowid)
+                    counts["updated"] += 1
+                self._add_to_index(conn, rowid, values)
+
+            if remove_missing:
+                for id_ in set(existing) - set(new_data):
+                    rowid = existing[id_][0]
+                    conn.execute("DELETE FROM indicators WHERE rowid = ?",
+                                 (rowid,))
+                    self._remove_from_index(conn, rowid)
+                    counts["removed"] += 1
+
+        logger.debug("Indicator catalog update: %s", counts)
+        return counts
+
+    def _add_to_index(self, conn, rowid, values):
+        if self.has_fts:
+            conn.execute(
+                "INSERT INTO indicators_fts (rowid, {}) VALUES ({})".format(
+                    ", ".join(COLUMNS), ", ".join("?" * (len(COLUMNS) + 1))),
+                [rowid] + values)
+
+    def _remove_from_index(self, conn, rowid):
+        if self.has_fts:
+            conn.execute("DELETE FROM indicators_fts WHERE rowid = ?",
+                         (rowid,))
+
+    def refresh(self, api=None):
+        """Update the catalog with the complete indicator list.
+
+        Args:
+            api: IndicatorAPI instance used for fetching.
+
+        Returns:
+            dict: number of added, updated and removed indicators.
+        """
+        api = api or api_wrapper.IndicatorAPI()
+        return self.update(api.get_indicators(filter_=None),
+                           remove_missing=True)
+
+    def search(self, text, limit=None):
+        """Get indicators that contain all words in text.
+
+        Each word matches as a prefix of a word in the indicator id, name,
+        source, description, organization or topics. Results are ordered by
+        relevance.
+
+        Args:
+            text: Search query.
+            limit: Max number of results.
+
+        Returns:
+            list[dict]: matching indicators.
+        """
+        return [json.loads(data) for data in
+                self._search("data", text, limit)]
+
+    def search_ids(self, text, limit=None):
+        """Get ids of indicators that contain all words in text.
+
+        This is the same as search, without loading indicator data.
+
+        Returns:
+            list[str]: ids of matching indicators ordered by relevance.
+        """
+        return self._search("id", text, limit)
+
+    def _search(self, column, text, limit):
+        """Get a column of indicators that match the search text."""
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            return []
+        limit = -1 if limit is None else limit
+        with self._connect() as conn:
+            if self.has_fts:
+                query = (
+                    "SELECT i.{} FROM indicators_fts f "
+                    "JOIN indicators i ON i.rowid = f.rowid "
+                    "WHERE indicators_fts MATCH ? "
+                    "ORDER BY bm25(indicators_fts, {}) LIMIT ?".format(
+                        column, ", ".join(str(w) for w in RANK_WEIGHTS)))
+                match = " ".join('"{}"*'.format(word) for word in words)
+                rows = conn.execute(query, (match, limit))
+            else:
+                text_column = " || ' ' || ".join(COLUMNS)
+                query = (
+                    "SELECT {} FROM indicators WHERE {} "
+                    "ORDER BY name LIMIT ?".format(column, " AND ".join(
+                        "lower({}) LIKE ?".format(text_column)
+                        for _ in words)))
+                rows = conn.execute(
+                    query, ["%{}%".format(word) for word in words] + [limit])
+            return [value for value, in rows]
+
+    def get(self, ids):
+        """Get stored indicators for the given ids.
+
+        Returns:
+            dict: indicator data for ids that are in the catalog.
+        """
+        ids = list(ids)
+        result = {}
+        with self._connect() as conn:
+            # Stay below the SQLite limit on the number of query parameters.
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = conn.execute(
+                    "SELECT id, data FROM indicators WHERE id IN ({})".format(
+                        ", ".join("?" * len(chunk))),
+                    chunk)
+                result.update((id_, json.loads(data)) for id_, data in rows)
+        return result
+
+
+_CATALOG = None
+_CATALOG_LOCK = threading.Lock()
+
+
+def get_catalog():
+    """Get the shared indicator catalog."""
+    # pylint: disable=global-statement
+    # The catalog is opened once per process.
+    global _CATALOG
+    with _CATALOG_LOCK:
+        if _CATALOG is None:
+            _CATALOG = IndicatorCatalog()
+        return _CATALOG
@@ -3,21 +3,33 @@
 This module has all the helper functions for generating proper structures for
 CountryTreeWidget.
 
-The three main exposed functions are:
+The main exposed functions are:
     get_countries_dict - Used in climate widget.
     get_countries_regions_dict - Used in indicator widget.
     get_alpha3_map - used for changing alpha3 codes to country names.
+    get_country_catalog - cached list of all countries from the indicator API.
 """
 import copy
+import time
 import logging
+import threading
+import urllib.parse
 from collections import defaultdict
 from collections import OrderedDict
 
 import pycountry
 import simple_wbd
 
+from orangecontrib.wbd import cache
+from orangecontrib.wbd import transport
+
 logger = logging.getLogger(__name__)
 
+CATALOG_TIME = cache.CACHE_TIME
+
+_catalog = {"countries": None, "time": 0}
+_catalog_lock = threading.Lock()
+
 MAPPINGS = {
     # Africa
     "Democratic Republic of the Congo": ("Congo, The Democratic Republic of "
@@ -436,15 +448,66 @@ def _gather_used_ids(items):
     return ids
 
 
-def _add_missing_aggregates(data):
+def _fetch_countries():
+    """Fetch countries and regions with the shared transport.
+
+    This returns the same data as simple_wbd.IndicatorAPI.get_countries.
+    """
+    api = simple_wbd.IndicatorAPI
+    url = urllib.parse.urljoin(api.BASE_URL, "countries" + api.GET_PARAMS)
+    countries = transport.fetch_json(url, priority=transport.INTERACTIVE)[1]
+    for country in countries:
+        for key in ["region", "adminregion", "incomeLevel", "lendingType"]:
+            country[key + "_text"] = "{value} ({id_})".format(
+                value=country.get(key, {}).get("value"),
+                id_=country.get(key, {}).get("id"),
+            )
+    return countries
+
+
+def get_country_catalog():
+    """Get a list of all countries and regions from the indicator API.
+
+    The list is kept in memory and in the persistent response cache, so it is
+    fetched at most once per CATALOG_TIME. The returned list is shared and
+    must not be modified.
+
+    Returns:
+        list[dict]: A list of countries and aggregate regions.
+    """
+    with _catalog_lock:
+        if (_catalog["countries"] is None or
+                time.time() - _catalog["time"] > CATALOG_TIME):
+            response_cache = cache.get_cache("countries")
+            key = cache.normalize_key("countries")
+            countries = response_cache.get(key)
+            if countries is None:
+                logger.debug("Fetching country catalog.")
+                countries = _fetch_countries()
+                response_cache.set(key, countries)
+                cache.get_snapshot_cache().set(key, countries)
+            _catalog["countries"] = countries
+            _catalog["time"] = time.time()
+        return _catalog["countries"]
+
+
+def get_country_snapshot():
+    """Get the last fetched country catalog regardless of its age.
+
+    Returns:
+        list[dict]: Countries and aggregate regions, or None if the catalog has
+            never been fetched.
+    """
+    return cache.get_snapshot_cache().get(cache.normalize_key("countries"))
+
+
+def _add_missing_aggregates(data, countries):
     """Add any missing aggregates to data.
 
     The data structure might be missing any newly added aggregates from the
     API. This function will add all of those under the other section of
     aggregates list.
     """
-    api = simple_wbd.IndicatorAPI()
-    countries = api.get_countries()
     aggregate_codes = set(
         [i.get("id") for i in countries if
          i.get("region", {}).get("value") == "Aggregates"]
@@ -457,10 +520,8 @@ def _add_missing_aggregates(data):
     return data
 
 
-def _add_missing_countries(data):
+def _add_missing_countries(data, countries):
     """Add all countries from the API to country data."""
-    api = simple_wbd.IndicatorAPI()
-    countries = api.get_countries()
     country_codes = set(
         [i.get("id") for i in countries if
          i.get("region", {}).get("value") != "Aggregates"]
@@ -471,20 +532,18 @@ def _add_missing_countries(data):
     return data
 
 
-def _generate_country_map():
-    api = simple_wbd.IndicatorAPI()
-    countries = api.get_countries()
+def _generate_country_map(countries):
     return {c["id"]: c for c in countries}
 
 
-def _generate_country_dict(data):
+def _generate_country_dict(data, country_map):
     """Turn the country and region structure into an ordered dict."""
-    country_map = _generate_country_map()
     country_dict = OrderedDict()
 
     for item in data:
         if isinstance(item, tuple):
-            country_dict[item[0]] = _generate_country_dict(item[1])
+            country_dict[item[0]] = _generate_country_dict(item[1],
+                                                           country_map)
         elif item in country_map:
             country_dict[item] = country_map[item]
         else:
@@ -492,9 +551,16 @@ def _generate_country_dict(data):
     return country_dict
 
 
-def get_countries_regions_dict():
-    """Get country and region data for indicators widget."""
+def get_countries_regions_dict(countries=None):
+    """Get country and region data for indicators widget.
+
+    Args:
+        countries: list of countries from the indicator API. Defaults to the
+            current country catalog.
+    """
+    if countries is None:
+        countries = get_country_catalog()
     data = copy.deepcopy(DATA_STRUCTURE)
-    data = _add_missing_aggregates(data)
-    data = _add_missing_countries(data)
-    return _generate_country_dict(data)
+    data = _add_missing_aggregates(data, countries)
+    data = _add_missing_countries(data, countries)
+    return _generate_country_dict(data, _generate_country_map(countries))
@@ -0,0 +1,230 @@
+"""Progress, cancellation and data buffers for dataset fetches.
+
+These helpers are shared by the indicator and climate APIs. Fetching threads
+report progress and check for cancellation through FetchProgress, and
+indicator pages can be streamed into an IndicatorBuffer as soon as they are
+fetched.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from collections import namedtuple
+from concurrent.futures import Future
+
+import numpy
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_value(value):
+    """Parse any non empty value into float or NaN."""
+    if value is None:
+        return numpy.nan
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        logger.warning("Failed to parse float value: %s", value)
+        return numpy.nan
+
+
+class FetchCancelled(Exception):
+    """Raised by fetching threads when a dataset fetch was cancelled."""
+
+
+class SerialExecutor(object):
+    """Executor that runs every function in the calling thread."""
+
+    @staticmethod
+    def submit(function, *args):
+        """Run the function and return a finished future."""
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as error:  # pylint: disable=broad-except
+            # The error is raised again by future.result().
+            future.set_exception(error)
+        return future
+
+
+ProgressEvent = namedtuple("ProgressEvent",
+                           ["progress", "rows", "bytes", "elapsed"])
+
+
+class FetchProgress(object):
+    """Progress and cancellation state of a single dataset fetch.
+
+    A fetch consists of parts, such as indicators or climate requests, and
+    each part can have multiple steps, such as pages. Every finished step is
+    reported to the callback as a ProgressEvent with the percentage of
+    finished parts, the number of fetched data points, the number of
+    downloaded bytes and the number of seconds since the fetch started.
+    """
+
+    def __init__(self, parts, cancelled=None, callback=None):
+        """Initialize fetch progress.
+
+        Args:
+            parts: Number of all parts.
+            cancelled: Optional threading.Event that cancels the fetch.
+            callback: Optional function that receives a ProgressEvent. It is
+                called from fetching threads.
+        """
+        self.parts = parts
+        self.cancelled = cancelled
+        self.callback = callback
+        self.rows = 0
+        self.bytes = 0
+        self.steps = 0
+        self.steps_total = 0
+        self.done = 0.0
+        self._part_steps = {}
+        self._start = time.time()
+        self._lock = threading.Lock()
+
+    def check_cancelled(self):
+        """Raise FetchCancelled if the fetch was cancelled."""
+        if self.cancelled is not None and self.cancelled.is_set():
+            raise FetchCancelled()
+
+    def add_bytes(self, size):
+        """Count downloaded bytes."""
+        with self._lock:
+            self.bytes += size
+
+    def update(self, part, steps=1, total=None, rows=0):
+        """Count finished steps of a part and report progress.
+
+        Args:
+            part: Part identifier.
+            steps: Number of newly finished steps.
+            total: Number of all steps for the part if it is known.
+            rows: Number of newly fetched data points.
+
+        Returns:
+            ProgressEvent: current progress.
+        """
+        with self._lock:
+            current, part_total = self._part_steps.get(part, (0, 1))
+            if total is not None:
+                part_total = total
+            self._part_steps[part] = (current + steps, part_total)
+            values = self._part_steps.values()
+            self.steps = sum(c for c, _ in values)
+            self.steps_total = sum(t for _, t in values)
+            self.done = sum(c / t for c, t in values)
+            self.rows += rows
+            event = ProgressEvent(
+                progress=100 * self.done / max(self.parts, 1),
+                rows=self.rows,
+                bytes=self.bytes,
+                elapsed=time.time() - self._start,
+            )
+        if self.callback is not None:
+            self.callback(event)
+        return event
+
+
+class IndicatorBuffer(object):
+    """Numeric storage for indicator data points.
+
+    Api pages are added as soon as they are fetched and stored as compact
+    chunks of country indexes, date indexes and float values, so the raw page
+    data can be discarded right away. Adding pages is thread safe.
+    """
+
+    def __init__(self, indicators):
+        """Initialize empty buffer.
+
+        Args:
+            indicators: list of all indicator ids that can be added. The order
+                of indicators defines the order of data points.
+        """
+        self._indicators = list(indicators)
+        self._indicator_map = {ind: i for i, ind in enumerate(indicators)}
+        self._discarded = set()
+        self._countries = OrderedDict()
+        self._dates = OrderedDict()
+        self._chunks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def indicators(self):
+        """List of indicators that were not discarded."""
+        return [ind for ind in self._indicators if ind not in self._discarded]
+
+    @staticmethod
+    def _get_indexes(keys, index_map):
+        return numpy.array(
+            [index_map.setdefault(key, len(index_map)) for key in keys],
+            dtype=numpy.int32,
+        )
+
+    @staticmethod
+    def _sort_labels(index_map, indexes):
+        """Get sorted labels and remap indexes to the sorted order."""
+        labels = numpy.array(list(index_map), dtype=str)
+        order = numpy.argsort(labels, kind="mergesort")
+        positions = numpy.empty(len(order), dtype=numpy.int32)
+        positions[order] = numpy.arange(len(order))
+        return labels[order], positions[indexes]
+
+    def add_page(self, indicator, data, page=1):
+        """Add data points from a single api page.
+
+        Args:
+            indicator: indicator id.
+            data: list of data points from the api response.
+            page: page number, used for ordering data points.
+        """
+        if not data:
+            return
+        with self._lock:
+            if indicator in self._discarded:
+                return
+            countries_ = self._get_indexes(
+                (p.get("country", {}).get("value", "") for p in data),
+                self._countries)
+            dates = self._get_indexes(
+                (p.get("date", "") for p in data), self._dates)
+            values = numpy.array([_parse_value(p.get("value")) for p in data],
+                                 dtype=float)
+            key = (self._indicator_map[indicator], page)
+            self._chunks[key] = (countries_, dates, values)
+
+    def discard(self, indicator):
+        """Remove all data points of an indicator."""
+        with self._lock:
+            self._discarded.add(indicator)
+            index = self._indicator_map[indicator]
+            for key in [k for k in self._chunks if k[0] == index]:
+                del self._chunks[key]
+
+    def get_points(self):
+        """Get all data points as flat arrays.
+
+        Returns:
+            tuple: list of all indicators, indicator indexes, sorted country
+                labels, country indexes, sorted date labels, date indexes and
+                values.
+        """
+        with self._lock:
+            keys = sorted(self._chunks)
+            chunks = [self._chunks[key] for key in keys]
+            indicator_indexes = numpy.concatenate(
+                [numpy.empty(0, dtype=numpy.int32)] +
+                [numpy.full(len(c[2]), k[0], dtype=numpy.int32)
+                 for k, c in zip(keys, chunks)])
+            country_labels, country_indexes = self._sort_labels(
+                self._countries, numpy.concatenate(
+                    [numpy.empty(0, dtype=numpy.int32)] +
+                    [c[0] for c in chunks]))
+            date_labels, date_indexes = self._sort_labels(
+                self._dates, numpy.concatenate(
+                    [numpy.empty(0, dtype=numpy.int32)] +
+                    [c[1] for c in chunks]))
+            values = numpy.concatenate([numpy.empty(0)] +
+                                       [c[2] for c in chunks])
+        return (list(self._indicators), indicator_indexes, country_labels,
+                country_indexes, date_labels, date_indexes, values)
@@ -1,26 +1,60 @@
 """Widget for displaying all indicators."""
 
+import difflib
 import textwrap
 import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from collections import namedtuple
+from collections import OrderedDict
 from functools import partial
 from functools import lru_cache
 
-import simple_wbd
+import numpy
 from PyQt4.QtCore import Qt, QThread, QCoreApplication
 from PyQt4 import QtGui
 from PyQt4 import QtCore
 from Orange.widgets import gui
 from Orange.widgets.utils import concurrent
 
+from orangecontrib.wbd import api_wrapper
+from orangecontrib.wbd import cache
+from orangecontrib.wbd import catalog
+from orangecontrib.wbd import scheduler
+
 TEXTFILTERROLE = next(gui.OrangeUserRole)
 logger = logging.getLogger(__name__)
 
+FACETS = ["Topic", "Source", "Organization"]
+
+FilterResult = namedtuple(
+    "FilterResult", ["strings", "generation", "masks", "mask", "ranked"])
+
 
 class MySortFilterProxyModel(QtGui.QSortFilterProxyModel):
     """Filter proxy model.
 
-    This class is used for improving filtering of indicators table.
+    This class is used for improving filtering of indicators table. Filter
+    text of all rows is read once when the source model is set. Rows accepted
+    by each filter string are kept as a read-only numpy boolean mask and
+    multiple filter strings are combined with a vectorized AND.
+
+    Results of recent filter strings are kept, so that a string that extends
+    a previous one (e.g. "pop" -> "popu") only rechecks the rows that matched
+    the previous string.
+
+    Filter masks can be computed on a worker thread with filter_mask and
+    applied on the GUI thread with set_filter_result.
+
+    IndicatorTableModel sorts itself with precomputed ranks, so the proxy
+    does not compare its rows one pair at a time. Other source models are
+    sorted with the default proxy comparison. Filter masks are indexed by
+    the unsorted data rows of IndicatorTableModel.
     """
+
+    PREFIX_CACHE_SIZE = 100
+    COMBINED_CACHE_SIZE = 100
     # pylint: disable=invalid-name
     # camel case names are false positives because they must be used to
     # override the original QtGui.QSortFilterProxyModel functions
@@ -29,31 +63,174 @@ class MySortFilterProxyModel(QtGui.QSortFilterProxyModel):
         QtGui.QSortFilterProxyModel.__init__(self, parent)
         self._filter_strings = []
         self._cache = {}
-        self._cache_fixed = {}
-        self._cache_prefix = {}
-        self._row_text = {}
+        self._cache_fixed = None
+        self._facet_mask = None
+        self._cache_prefix = OrderedDict()
+        self._row_text = []
+        self._row_order = None
+        self._table_model = None
+        self._lock = threading.RLock()
+        self._generation = 0
 
         # Create a cached version of _filtered_rows
-        self._filtered_rows_cached = lru_cache(100)(self._filtered_rows)
+        self._filtered_rows_cached = lru_cache(self.COMBINED_CACHE_SIZE)(
+            self._filtered_rows)
 
     def setSourceModel(self, model):
-        """Set the source model for the filter.
+        """Set the source model for the filter and read its filter text.
         """
-        self._filter_strings = []
-        self._cache = {}
-        self._cache_fixed = {}
-        self._cache_prefix = {}
-        self._row_text = {}
-        QtGui.QSortFilterProxyModel.setSourceModel(self, model)
+        with self._lock:
+            self._generation += 1
+            self._filter_strings = []
+            self._cache = {}
+            self._cache_fixed = None
+            self._facet_mask = None
+            self._cache_prefix = OrderedDict()
+            self._filtered_rows_cached = lru_cache(self.COMBINED_CACHE_SIZE)(
+                self._filtered_rows)
+            self._row_order = None
+            self._table_model = None
+            if isinstance(model, IndicatorTableModel):
+                self._row_order = model.row_order()
+                self._table_model = model
+            QtGui.QSortFilterProxyModel.setSourceModel(self, model)
+            if isinstance(model, IndicatorTableModel):
+                self._row_text = model.filter_texts()
+            else:
+                self._row_text = [self.rowFilterText(row)
+                                  for row in range(model.rowCount())]
+
+    def _search(self, string):
+        """Get a boolean mask of rows whose filter text contains string.
+
+        If string contains any recently searched string, only rows that
+        matched the smallest such result are checked.
+        """
+        with self._lock:
+            base_rows = None
+            base_count = None
+            for term, mask in self._cache_prefix.items():
+                if term in string:
+                    count = numpy.count_nonzero(mask)
+                    if base_rows is None or count < base_count:
+                        base_rows, base_count = mask, count
+
+            row_text = self._row_text
+            if base_rows is None:
+                rows = [row for row, text in enumerate(row_text)
+                        if string in text]
+            else:
+                rows = [row for row in numpy.flatnonzero(base_rows)
+                        if string in row_text[row]]
+
+            mask = numpy.zeros(len(self._row_text), dtype=bool)
+            mask[rows] = True
+            mask.flags.writeable = False
+
+            self._cache_prefix.pop(string, None)
+            self._cache_prefix[string] = mask
+            if len(self._cache_prefix) > self.PREFIX_CACHE_SIZE:
+                self._cache_prefix.popitem(last=False)
+            return mask
+
+    def filter_mask(self, strings):
+        """Compute rows accepted by all filter strings.
+
+        This does not change the displayed rows, so it is safe to call from a
+        worker thread.
+
+        Args:
+            strings: list of filter strings.
+
+        Returns:
+            FilterResult: masks for the given strings and their combined mask,
+                which is None if there are no strings. Results are not
+                ranked.
+        """
+        strings = tuple(strings)
+        with self._lock:
+            generation = self._generation
+            masks = [self._search(str_) for str_ in strings]
+        if not masks:
+            mask = None
+        elif len(masks) == 1:
+            mask = masks[0]
+        else:
+            mask = numpy.logical_and.reduce(masks)
+            mask.flags.writeable = False
+        return FilterResult(strings, generation, masks, mask, None)
+
+    def filter_ids(self, strings, ids):
+        """Create a filter result that accepts the given indicators.
+
+        This is used for filter strings that were matched with a catalog
+        search instead of substring matching. Like filter_mask, it is safe to
+        call from a worker thread. The source model must be an
+        IndicatorTableModel.
+
+        Args:
+            strings: list of filter strings.
+            ids: list of matching indicator ids ordered by relevance.
+
+        Returns:
+            FilterResult: mask of matching rows, and data rows of matching
+                indicators ordered by relevance.
+        """
+        strings = tuple(strings)
+        with self._lock:
+            generation = self._generation
+            rows = self._table_model.id_data_rows(ids)
+            mask = numpy.zeros(len(self._row_text), dtype=bool)
+            mask[rows] = True
+            mask.flags.writeable = False
+        return FilterResult(strings, generation, [mask] * len(strings), mask,
+                            rows)
+
+    def set_filter_result(self, result):
+        """Show rows from a filter_mask result.
+
+        Args:
+            result: FilterResult returned by filter_mask or filter_ids.
+                Ranked results are also sorted by relevance.
+
+        Returns:
+            bool: False if the result was computed for a different source
+                model and was not applied.
+        """
+        if result.generation != self._generation:
+            return False
+        self._filter_strings = list(result.strings)
+        self._cache = dict(zip(result.strings, result.masks))
+        self._cache_fixed = result.mask
+        self.invalidateFilter()
+        if result.ranked is not None:
+            self._table_model.sort_by_relevance(result.ranked)
+        return True
+
+    def cache_info(self):
+        """Get the number of cached filter masks and their memory use.
+
+        Returns:
+            dict with the number of masks for filter strings, recent
+            strings and combined filters and the total size in bytes.
+        """
+        masks = {id(mask): mask for mask in self._cache.values()}
+        masks.update((id(mask), mask) for mask in self._cache_prefix.values())
+        combined = self._filtered_rows_cached.cache_info().currsize
+        return {
+            "strings": len(self._cache),
+            "recent": len(self._cache_prefix),
+            "combined": combined,
+            "bytes": (sum(mask.nbytes for mask in masks.values()) +
+                      combined * len(self._row_text)),
+        }
 
     def addFilterFixedString(self, string, invalidate=True):
         """ Add `string` filter to the list of filters. If invalidate is
         True the filter cache will be recomputed.
         """
         self._filter_strings.append(string)
-        all_rows = range(self.sourceModel().rowCount())
-        row_text = [self.rowFilterText(row) for row in all_rows]
-        self._cache[string] = [string in text for text in row_text]
+        self._cache[string] = self._search(string)
         if invalidate:
             self.updateCached()
             self.invalidateFilter()
@@ -84,15 +261,22 @@ class MySortFilterProxyModel(QtGui.QSortFilterProxyModel):
         self.invalidate()
 
     def _filtered_rows(self, filter_strings):
-        """Return a dictionary mapping row indexes to True False values.
+        """Return a mask of rows that match all filter strings.
 
         .. note:: This helper function is wrapped in the __init__ method.
 
+        Returns:
+            numpy boolean array of accepted rows, or None if there are no
+            filters.
         """
-        all_rows = range(self.sourceModel().rowCount())
-        cache = self._cache
-        return dict([(row, all([cache[str][row] for str in filter_strings]))
-                     for row in all_rows])
+        if not filter_strings:
+            return None
+        if len(filter_strings) == 1:
+            return self._cache[filter_strings[0]]
+        mask = numpy.logical_and.reduce(
+            [self._cache[str_] for str_ in filter_strings])
+        mask.flags.writeable = False
+        return mask
 
     def updateCached(self):
         """Update the combined filter cache.
@@ -114,21 +298,218 @@ class MySortFilterProxyModel(QtGui.QSortFilterProxyModel):
         data = s_model.data(s_model.index(row, f_column), f_role)
         return str(data)
 
+    def set_facet_mask(self, mask):
+        """Show only rows in the given mask, in addition to text filters.
+
+        Args:
+            mask: numpy boolean array of accepted rows, or None to accept all
+                rows.
+        """
+        self._facet_mask = mask
+        self.invalidateFilter()
+
     def filterAcceptsRow(self, row, _):
-        return self._cache_fixed.get(row, True)
-
-    def lessThan(self, left, right):
-        """Less comparator for columns."""
-        if left.column() == 1 and right.column():
-            left_gds = str(left.data(Qt.DisplayRole))
-            right_gds = str(right.data(Qt.DisplayRole))
-            left_gds = left_gds.lstrip("GDS")
-            right_gds = right_gds.lstrip("GDS")
-            try:
-                return int(left_gds) < int(right_gds)
-            except ValueError:
-                pass
-        return QtGui.QSortFilterProxyModel.lessThan(self, left, right)
+        if self._row_order is not None:
+            row = self._row_order[row]
+        return ((self._cache_fixed is None or bool(self._cache_fixed[row])) and
+                (self._facet_mask is None or bool(self._facet_mask[row])))
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Sort rows by the given column.
+
+        IndicatorTableModel is sorted in the source model, other models are
+        sorted by the proxy.
+        """
+        model = self.sourceModel()
+        if isinstance(model, IndicatorTableModel):
+            model.sort(column, order)
+        else:
+            QtGui.QSortFilterProxyModel.sort(self, column, order)
+
+
+def _id_sort_key(indicator_id):
+    """Get a sort key that orders GDS ids by number."""
+    try:
+        return (0, int(indicator_id.lstrip("GDS")), "")
+    except ValueError:
+        return (1, 0, indicator_id)
+
+
+class IndicatorTableModel(QtCore.QAbstractTableModel):
+    """Read only table model for the indicator list.
+
+    Cell values are stored in plain lists and served from data() on demand,
+    instead of creating an item for every cell.
+    """
+    # pylint: disable=invalid-name
+    # camel case names are false positives because they must be used to
+    # override the original QtCore.QAbstractTableModel functions
+
+    HEADER = ["", "Id", "Name", "Topics", "Source"]
+
+    def __init__(self, rows, get_link=None, facets=None, parent=None):
+        """Create a model for the given rows.
+
+        Args:
+            rows: list of Id, Name, Topics and Source values for each
+                indicator, as returned by get_indicator_rows.
+            get_link: function that returns a link for an indicator id.
+            facets: indicator ids for each facet value, as returned by
+                get_indicator_facets.
+            parent: parent QObject.
+        """
+        super().__init__(parent)
+        self._columns = [[""] * len(rows)] + [list(col) for col in zip(*rows)]
+        if not rows:
+            self._columns += [[] for _ in self.HEADER[1:]]
+        self._filter_text = [" | ".join([""] + row).lower() for row in rows]
+        self._get_link = get_link
+        # Data row shown in each model row. The array is updated in place, so
+        # that proxy models can keep a reference to it.
+        self._order = numpy.arange(len(rows))
+        # Models are built on a worker thread, so all columns are ranked
+        # while loading and sorting on the GUI thread only reorders rows.
+        self._sort_ranks = [self._rank_column(column)
+                            for column in range(len(self.HEADER))]
+
+        self._id_rows = {id_: row for row, id_ in enumerate(self._columns[1])}
+        self._facets = OrderedDict(
+            (facet, {
+                value: numpy.array(sorted(self._id_rows[id_] for id_ in ids),
+                                   dtype=int)
+                for value, ids in values.items()
+            })
+            for facet, values in (facets or {}).items()
+        )
+
+    def row_order(self):
+        """Get the data row shown in each model row.
+
+        Filter texts, facet masks and sort ranks are indexed by data rows.
+        The returned array is changed in place when the model is sorted.
+        """
+        return self._order
+
+    def filter_texts(self):
+        """Get lower case filter text of all data rows.
+
+        The returned list is shared and must not be modified.
+        """
+        return self._filter_text
+
+    def id_data_rows(self, ids):
+        """Get data rows of the given indicator ids that are in the model."""
+        return [self._id_rows[id_] for id_ in ids if id_ in self._id_rows]
+
+    def id_rows(self, ids):
+        """Get model rows of the given indicator ids that are in the model."""
+        positions = numpy.argsort(self._order)
+        return [int(positions[row]) for row in self.id_data_rows(ids)]
+
+    def facet_values(self):
+        """Get sorted values for each facet."""
+        return OrderedDict((facet, sorted(values))
+                           for facet, values in self._facets.items())
+
+    def facet_mask(self, selection):
+        """Get data rows that match all selected facet values.
+
+        Args:
+            selection: dict of selected value for each facet.
+
+        Returns:
+            numpy boolean array of matching rows, or None if nothing is
+                selected.
+        """
+        mask = None
+        for facet, value in selection.items():
+            rows = self._facets.get(facet, {}).get(value, [])
+            facet_mask = numpy.zeros(self.rowCount(), dtype=bool)
+            facet_mask[rows] = True
+            mask = facet_mask if mask is None else mask & facet_mask
+        return mask
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._filter_text)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADER)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = self._order[index.row()], index.column()
+        if role == Qt.DisplayRole:
+            return self._columns[column][row]
+        if role == TEXTFILTERROLE and column == 0:
+            return self._filter_text[row]
+        if role == gui.LinkRole and column == 1 and self._get_link:
+            return self._get_link(self._columns[1][row])
+        return None
+
+    def _rank_column(self, column):
+        """Get the position of each data row when sorted by a column."""
+        values = self._columns[column]
+        if column == 1:
+            values = [_id_sort_key(value) for value in values]
+        order = sorted(range(len(values)), key=values.__getitem__)
+        ranks = numpy.empty(len(values), dtype=int)
+        ranks[order] = numpy.arange(len(values))
+        ranks.flags.writeable = False
+        return ranks
+
+    def sort_ranks(self, column):
+        """Get the position of each data row when sorted by the given column.
+
+        Returns:
+            numpy.ndarray: read-only sort rank of each row.
+        """
+        return self._sort_ranks[column]
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Reorder rows with the precomputed ranks of the given column.
+
+        Columns outside of the table, such as -1 for a cleared sort
+        indicator, keep the current order.
+        """
+        if not 0 <= column < len(self.HEADER):
+            return
+        ranks = self.sort_ranks(column)
+        new_order = numpy.empty(len(ranks), dtype=int)
+        new_order[ranks] = numpy.arange(len(ranks))
+        if order == Qt.DescendingOrder:
+            new_order = new_order[::-1]
+        self._set_order(new_order)
+
+    def sort_by_relevance(self, rows):
+        """Show the given data rows first, in the given order.
+
+        All other rows keep their current order.
+        """
+        first = numpy.array(rows, dtype=int)
+        rest = numpy.ones(len(self._order), dtype=bool)
+        rest[first] = False
+        self._set_order(numpy.concatenate([first,
+                                           self._order[rest[self._order]]]))
+
+    def _set_order(self, new_order):
+        """Show data rows in a new order and remap persistent indexes."""
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        old_rows = [self._order[index.row()] for index in old_indexes]
+        self._order[:] = new_order
+        positions = numpy.empty(len(new_order), dtype=int)
+        positions[new_order] = numpy.arange(len(new_order))
+        self.changePersistentIndexList(old_indexes, [
+            self.index(int(positions[row]), index.column())
+            for row, index in zip(old_rows, old_indexes)
+        ])
+        self.layoutChanged.emit()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADER[section]
+        return None
 
 
 class IndicatorsTreeView(QtGui.QTreeView):
@@ -138,8 +519,12 @@ class IndicatorsTreeView(QtGui.QTreeView):
         super().__init__(parent)
         self._main_widget = main_widget
         self._fetch_task = None
+        self._snapshot_task = None
         self._indicator_data = None
-        self._api = simple_wbd.IndicatorAPI()
+        self._descriptions = {}
+        self._shown_ids = []
+        self._description_frames = {}
+        self._api = api_wrapper.IndicatorAPI()
         self.setAlternatingRowColors(True)
         self.setEditTriggers(QtGui.QTreeView.NoEditTriggers)
         self.setRootIsDecorated(False)
@@ -160,15 +545,57 @@ class IndicatorsTreeView(QtGui.QTreeView):
         self.selectionModel().selectionChanged.connect(self._update_selection)
         self.viewport().setMouseTracking(True)
 
-        self._executor = concurrent.ThreadExecutor()
+        self._executor = scheduler.get_executor(scheduler.INTERACTIVE)
         self.fetch_indicators()
 
     def fetch_indicators(self):
-        """Trigger a background job for fetching a new indicator list."""
-        self._main_widget.setBlocking(True)
-        self._main_widget.setEnabled(False)
+        """Show the indicator list and fetch a fresh one in the background.
+
+        The snapshot of the indicator list is loaded in the background. If it
+        exists, it is shown first and the widget stays usable while the list
+        is refreshed. Otherwise the widget is blocked until the first list is
+        fetched.
+        """
+        filter_ = self._main_widget.basic_indicator_filter()
+        self._fetch_task = None
+        self._snapshot_task = concurrent.Task(
+            function=partial(self._load_snapshot, filter_))
+        self._snapshot_task.resultReady.connect(self._snapshot_loaded)
+        self._snapshot_task.exceptionReady.connect(self._init_exception)
+        self._executor.submit(self._snapshot_task)
+
+    def _load_snapshot(self, filter_):
+        """Background task for loading the indicator list snapshot.
+
+        Returns:
+            tuple: filter, snapshot data and its model. Data and model are
+                None if the list has never been fetched.
+        """
+        snapshot = get_indicator_snapshot(filter_)
+        model = None
+        if snapshot is not None:
+            model = self._build_model(snapshot)
+            _move_to_main_thread(model)
+        return filter_, snapshot, model
+
+    @QtCore.pyqtSlot(object)
+    def _snapshot_loaded(self, result):
+        """Show the snapshot and start fetching a fresh indicator list."""
+        if self.sender() is not self._snapshot_task:
+            # Result of a snapshot for a previously selected list.
+            return
+        self._snapshot_task = None
+        filter_, snapshot, model = result
+        if model is not None:
+            self._set_model(model, snapshot)
+        else:
+            self._main_widget.setBlocking(True)
+            self._main_widget.setEnabled(False)
+
         func = partial(
             self._fetch_indicators,
+            filter_,
+            snapshot,
             concurrent.methodinvoke(
                 self._main_widget, "set_progress", (float,))
         )
@@ -178,8 +605,74 @@ class IndicatorsTreeView(QtGui.QTreeView):
         self._executor.submit(self._fetch_task)
 
     def _get_selected_ids(self):
-        return [i.data(Qt.DisplayRole) for i in self.selectedIndexes()
-                if i.column() == 1]
+        return [i.data(Qt.DisplayRole)
+                for i in self.selectionModel().selectedRows(1)]
+
+    def _get_description(self, indicator_id):
+        """Get a cached description for the given indicator."""
+        if indicator_id not in self._descriptions:
+            self._descriptions[indicator_id] = self._generate_description(
+                indicator_id)
+        return self._descriptions[indicator_id]
+
+    def _show_descriptions(self, ids):
+        """Show descriptions of the given indicators.
+
+        Each description is kept in its own text frame. Only descriptions of
+        removed or moved indicators are deleted from the text and only new or
+        moved ones are inserted.
+        """
+        document = self._main_widget.indicator_description.document()
+        frames = self._description_frames
+        operations = difflib.SequenceMatcher(
+            None, self._shown_ids, ids, autojunk=False).get_opcodes()
+        kept = set()
+        for tag, old_start, old_end, _, _ in operations:
+            if tag == "equal":
+                kept.update(self._shown_ids[old_start:old_end])
+            else:
+                for indicator_id in self._shown_ids[old_start:old_end]:
+                    self._remove_frame(document, frames.pop(indicator_id))
+        for tag, _, old_end, new_start, new_end in operations:
+            if tag in ("insert", "replace"):
+                before = next((frames[indicator_id] for indicator_id
+                               in self._shown_ids[old_end:]
+                               if indicator_id in kept), None)
+                for indicator_id in ids[new_start:new_end]:
+                    frames[indicator_id] = self._insert_frame(
+                        document, before, self._get_description(indicator_id))
+        self._shown_ids = list(ids)
+
+    @staticmethod
+    def _remove_frame(document, frame):
+        """Delete a text frame and its contents."""
+        cursor = QtGui.QTextCursor(document)
+        cursor.setPosition(frame.firstPosition() - 1)
+        cursor.setPosition(frame.lastPosition() + 1,
+                           QtGui.QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+
+    @staticmethod
+    def _insert_frame(document, before, html):
+        """Insert html in a new text frame.
+
+        Args:
+            document: QTextDocument.
+            before: Frame in front of which the new one is inserted. If None,
+                the frame is added at the end.
+            html: Frame contents.
+
+        Returns:
+            QtGui.QTextFrame: the new frame.
+        """
+        cursor = QtGui.QTextCursor(document)
+        if before is None:
+            cursor.movePosition(QtGui.QTextCursor.End)
+        else:
+            cursor.setPosition(before.firstPosition() - 1)
+        frame = cursor.insertFrame(QtGui.QTextFrameFormat())
+        cursor.insertHtml(html)
+        return frame
 
     def _generate_description(self, indicator_id):
         data = self._indicator_data.get(indicator_id, {})
@@ -208,87 +701,117 @@ class IndicatorsTreeView(QtGui.QTreeView):
         )
 
     def _update_selection(self):
+        """Show and store selected indicators.
+
+        A commit is only triggered if the selected indicators changed.
+        """
         ids = self._get_selected_ids()
+        changed = set(ids) != set(self._main_widget.indicator_selection)
         self._main_widget.indicator_selection = ids
-        text = "\n\n".join(
-            self._generate_description(indicator_id=indicator_id)
-            for indicator_id in self._get_selected_ids()
-        )
-        self._main_widget.indicator_description.clear()
-        self._main_widget.indicator_description.setHtml(text)
+        self._show_descriptions(ids)
         self._main_widget.description_box.setTitle(
             "Description ({} {} selected)".format(
                 len(ids),
                 "indicator" if len(ids) == 1 else "indicators",
             )
         )
-        self._main_widget.commit_if()
+        if changed:
+            self._main_widget.commit_if()
+
+    def _restore_selection(self):
+        """Select rows of stored indicator ids in a new model.
+
+        Setting a source model clears the selection without emitting
+        selectionChanged. Ids that are not in the new model are removed from
+        the stored selection. Selecting rows emits selectionChanged, so the
+        selection is only updated here if no rows were selected.
+        """
+        proxy = self.model()
+        source = proxy.sourceModel()
+        selection = QtGui.QItemSelection()
+        for row in source.id_rows(self._main_widget.indicator_selection):
+            index = proxy.mapFromSource(source.index(row, 0))
+            if index.isValid():
+                selection.select(index, index)
+        self.selectionModel().select(
+            selection,
+            QtGui.QItemSelectionModel.ClearAndSelect |
+            QtGui.QItemSelectionModel.Rows)
+        if selection.isEmpty():
+            self._update_selection()
 
     @staticmethod
     def _get_link(id_):
         return "http://data.worldbank.org/indicator/{}?view=chart".format(id_)
 
-    def _fetch_indicators(self, progress=lambda val: None):
-        """Background task for fetching indicators."""
+    @classmethod
+    def _build_model(cls, data):
+        """Build a table model for the given indicator list."""
+        return IndicatorTableModel(get_indicator_rows(data),
+                                   get_link=cls._get_link,
+                                   facets=get_indicator_facets(data))
+
+    def _fetch_indicators(self, filter_, snapshot=None,
+                          progress=lambda val: None):
+        """Background task for fetching indicators.
+
+        Returns:
+            tuple: new indicator data and its model, or None if the data did
+                not change since the snapshot.
+        """
         progress(0)
-        def row_item(display_value, item_values=None):
-            """Generate a cell item for a given row."""
-            if not item_values:
-                item_values = {}
-            item = QtGui.QStandardItem()
-            item.setData(display_value, Qt.DisplayRole)
-            for role, value in item_values.items():
-                item.setData(value, role)
-            return item
-
-        progress(10)
-        filter_ = self._main_widget.basic_indicator_filter()
         data = self._api.get_indicators(filter_=filter_)
-        self._indicator_data = {ind["id"]: ind for ind in data}
+        cache.get_snapshot_cache().set(_snapshot_key(filter_), data)
+        changed = data != snapshot
+        try:
+            # The catalog is used for searching the list of all indicators.
+            indicator_catalog = catalog.get_catalog()
+            if filter_ == "All":
+                # The catalog can be incomplete if it was only filled from
+                # other lists, even if the list of all indicators is the same.
+                stale = len(indicator_catalog) != len(
+                    {ind["id"].strip() for ind in data if ind.get("id")})
+            else:
+                stale = not len(indicator_catalog)
+            if changed or stale:
+                indicator_catalog.update(data,
+                                         remove_missing=filter_ == "All")
+        except sqlite3.Error:
+            logger.exception("Failed to update the indicator catalog.")
         progress(70)
+        if not changed:
+            logger.debug("Indicator list did not change.")
+            progress(100)
+            return None
 
-        indicators = [[""] + row for row in
-                      self._api.get_indicator_list(filter_=filter_)]
-
-        model = QtGui.QStandardItemModel()
-        model.setHorizontalHeaderLabels(indicators[0])
-        for row in indicators[1:]:
-            search_string = " | ".join(row).lower()
-            row_data = [row_item(item) for item in row]
-            row_data[0].setData(search_string, TEXTFILTERROLE)
-            row_data[1].setData(self._get_link(row[1]), gui.LinkRole)
-            model.appendRow(row_data)
+        model = self._build_model(data)
 
         progress(100)
-        if QThread.currentThread() is not QCoreApplication.instance().thread():
-            model.moveToThread(QCoreApplication.instance().thread())
-        return model
-
-    def _init_exception(self):
-        pass
+        _move_to_main_thread(model)
+        return data, model
 
-    def _fetch_indicators_finished(self):
-        """Finish handler for fetching indicators.
+    def _init_exception(self, exception=None):
+        logger.warning("Failed to load indicators: %s", exception)
+        self._main_widget.setBlocking(False)
+        self._main_widget.setEnabled(True)
 
-        This takes the _fetch_indicators result and updates the displayed list
-        of indicators.
-        """
-        assert self.thread() is QtCore.QThread.currentThread()
-        if self._fetch_task is None:
-            return
-        model = self._fetch_task.result()
+    def _set_model(self, model, data):
+        """Show a new indicator model."""
+        self._indicator_data = {ind["id"]: ind for ind in data}
+        self._descriptions = {}
+        self._shown_ids = []
+        self._description_frames = {}
+        self._main_widget.indicator_description.clear()
         model.setParent(self)
 
         proxy = self.model()
         proxy.setFilterKeyColumn(0)
         proxy.setFilterRole(TEXTFILTERROLE)
         proxy.setFilterCaseSensitivity(False)
-        # proxy.setFilterFixedString(self.filterString)
 
         proxy.setSourceModel(model)
         proxy.sort(1, QtCore.Qt.DescendingOrder)
-
-        # self.progressBarFinished()
+        self._restore_selection()
 
         for i in range(3):
             self.resizeColumnToContents(i)
@@ -300,6 +823,91 @@ class IndicatorsTreeView(QtGui.QTreeView):
 
         self._main_widget.info_data["Indicators"] = model.rowCount()
         self._main_widget.print_info()
+        self._main_widget.set_facets(model.facet_values())
+        proxy.set_facet_mask(
+            model.facet_mask(self._main_widget.facet_selection()))
+        self._main_widget.filter_indicator_list()
+
+    def _fetch_indicators_finished(self):
+        """Finish handler for fetching indicators.
+
+        This takes the _fetch_indicators result and updates the displayed list
+        of indicators if it has changed.
+        """
+        assert self.thread() is QtCore.QThread.currentThread()
+        if self._fetch_task is None or self.sender() is not self._fetch_task:
+            # Finished signal from a previous task.
+            return
+        if self._fetch_task.future().exception() is not None:
+            # The list could not be refreshed, so the snapshot is kept.
+            # Errors are handled by _init_exception.
+            return
+        result = self._fetch_task.result()
+        if result is not None:
+            data, model = result
+            self._set_model(model, data)
 
         self._main_widget.setBlocking(False)
         self._main_widget.setEnabled(True)
+
+
+def _move_to_main_thread(model):
+    """Move a model created in a worker thread to the GUI thread."""
+    if QThread.currentThread() is not QCoreApplication.instance().thread():
+        model.moveToThread(QCoreApplication.instance().thread())
+
+
+def _snapshot_key(filter_):
+    return cache.normalize_key("indicators", filter_ or "all")
+
+
+def get_indicator_snapshot(filter_):
+    """Get the last fetched indicator list for the given filter.
+
+    Returns:
+        list[dict]: Indicator data, or None if the list has never been
+            fetched.
+    """
+    return cache.get_snapshot_cache().get(_snapshot_key(filter_))
+
+
+def get_indicator_rows(data):
+    """Get Id, Name, Topics and Source columns for all indicators."""
+    return [
+        [
+            indicator.get("id", "").strip(),
+            indicator.get("name", "").strip(),
+            ", ".join(
+                topic.get("value", "").strip()
+                for topic in indicator.get("topics", [])
+            ),
+            indicator.get("source", {}).get("value", "").strip(),
+        ]
+        for indicator in data
+    ]
+
+
+def get_indicator_facets(data):
+    """Get indicator ids for every topic, source and organization.
+
+    Args:
+        data: list of indicator dicts.
+
+    Returns:
+        OrderedDict: map from facet name to a dict of indicator id sets for
+            each facet value.
+    """
+    facets = OrderedDict((facet, defaultdict(set)) for facet in FACETS)
+    for indicator in data:
+        id_ = indicator.get("id", "").strip()
+        for topic in indicator.get("topics") or []:
+            if topic.get("value", "").strip():
+                facets["Topic"][topic["value"].strip()].add(id_)
+        source = (indicator.get("source") or {}).get("value", "").strip()
+        if source:
+            facets["Source"][source].add(id_)
+        organization = (indicator.get("sourceOrganization") or "").strip()
+        if organization:
+            facets["Organization"][organization].add(id_)
+    return OrderedDict((facet, dict(values))
+                       for facet, values in facets.items())
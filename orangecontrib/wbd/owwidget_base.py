@@ -4,15 +4,19 @@ This module contains the world bank data widget, used for fetching data from
 world bank data API.
 """
 
+import math
 import logging
+import threading
 import collections
 from functools import partial
 
-import requests
 from PyQt4 import QtCore
 from Orange.widgets import widget
 from Orange.widgets.utils import concurrent
 
+from orangecontrib.wbd import fetching
+from orangecontrib.wbd import scheduler
+from orangecontrib.wbd import transport
 
 logger = logging.getLogger(__name__)
 
@@ -30,29 +34,54 @@ class OWWidgetBase(widget.OWWidget):
     category = "Data Sets"
     country_selection = None
 
+    # Delay in milliseconds for merging quick changes into one auto commit.
+    COMMIT_DELAY = 500
+
     def __init__(self):
         super().__init__()
         logger.debug("Initializing %s", self.__class__.__name__)
         self._fetch_task = None
+        self._status_task = None
         self._info_label = None
         self._selection_changed = False
-        self._set_progress_flag = False
-        self._executor = concurrent.ThreadExecutor()
+        self._cancel_event = None
+        # Data downloads and quick tasks for the widget interface run in the
+        # shared scheduler with different priorities.
+        self._executor = scheduler.get_executor(scheduler.BULK)
+        self._interactive_executor = scheduler.get_executor(
+            scheduler.INTERACTIVE)
+        self._commit_timer = QtCore.QTimer(
+            self, singleShot=True, interval=self.COMMIT_DELAY)
+        self._commit_timer.timeout.connect(self.commit)
         self.info_data = collections.OrderedDict([
             ("Server status", None),
             ("Indicators", None),
             ("Selected countries", None),
             ("Rows", None),
             ("Columns", None),
+            ("Fetched", None),
             ("Warning", None),
         ])
 
     def _check_server_status(self):
-        try:
-            requests.get('http://api.worldbank.org', timeout=1)
-            self.info_data["Server status"] = "Up"
-        except requests.exceptions.Timeout:
-            self.info_data["Server status"] = "Down"
+        """Show the server status without blocking the widget.
+
+        A status that was recently checked by any widget is shown
+        immediately, otherwise the server is checked in the background.
+        """
+        status = transport.get_cached_status()
+        if status is not None:
+            self._set_server_status(status)
+            return
+        self._status_task = concurrent.Task(function=transport.check_status)
+        self._status_task.resultReady.connect(self._set_server_status)
+        self._status_task.exceptionReady.connect(
+            self._fetch_dataset_exception)
+        self._interactive_executor.submit(self._status_task)
+
+    @QtCore.pyqtSlot(object)
+    def _set_server_status(self, status):
+        self.info_data["Server status"] = status
         self.print_info()
 
     def print_info(self):
@@ -67,30 +96,57 @@ class OWWidgetBase(widget.OWWidget):
         """Auto commit handler.
 
         This function must be called on every action that should trigger an
-        auto commit.
+        auto commit. Changes made within COMMIT_DELAY of each other trigger a
+        single commit.
         """
         logger.debug("Commit If - auto_commit: %s", self.auto_commit)
         if self.auto_commit:
-            self.commit()
+            self._commit_timer.start()
         else:
             self._selection_changed = True
 
+    def cancel_fetch(self):
+        """Cancel the current dataset fetch.
+
+        A fetch that has not started yet is removed from the queue, and a
+        running fetch stops requesting new pages. Its result is never sent.
+        """
+        if self._fetch_task is not None:
+            logger.debug("cancel data fetch")
+            self._fetch_task.future().cancel()
+            self._cancel_event.set()
+            self._fetch_task = None
+
     def commit(self):
-        """Fetch the climate data and send a new orange table."""
+        """Fetch the data and send a new orange table.
+
+        The widget stays usable while fetching, and a new commit cancels the
+        previous one.
+        """
         logger.debug("commit data")
-        self.setEnabled(False)
-        self._set_progress_flag = True
+        self._commit_timer.stop()
+        self.cancel_fetch()
+        self.set_progress(0)
+        cancel_event = self._cancel_event = threading.Event()
+        set_fetch_progress = concurrent.methodinvoke(
+            self, "set_fetch_progress", (object,))
+
+        def progress_callback(event):
+            """Forward progress events of this fetch to the GUI thread."""
+            if not cancel_event.is_set():
+                set_fetch_progress(event)
 
         func = partial(
             self._fetch_dataset,
-            concurrent.methodinvoke(self, "set_progress", (float,))
+            progress_callback,
+            cancelled=cancel_event,
         )
         self._fetch_task = concurrent.Task(function=func)
         self._fetch_task.finished.connect(self._fetch_dataset_finished)
         self._fetch_task.exceptionReady.connect(self._fetch_dataset_exception)
         self._executor.submit(self._fetch_task)
 
-    def _fetch_dataset(self, set_progress=None):
+    def _fetch_dataset(self, progress_callback=None, cancelled=None):
         raise NotImplementedError(
             "Missing implementation for _fetch_dataset.")
 
@@ -99,16 +155,21 @@ class OWWidgetBase(widget.OWWidget):
             "Missing implementation for _dataset_to_table.")
 
     def _fetch_dataset_finished(self):
-        """Send data signal on finished dataset fetch."""
+        """Send data signal on finished dataset fetch.
+
+        Results of cancelled or superseded fetches are ignored.
+        """
         assert self.thread() is QtCore.QThread.currentThread()
-        self.setEnabled(True)
-        self._set_progress_flag = False
+        task = self.sender()
+        if task is None or task is not self._fetch_task:
+            return
+        self._fetch_task = None
         self.set_progress(100)
 
-        if self._fetch_task is None:
+        if task.future().exception() is not None:
             return
 
-        dataset = self._fetch_task.result()
+        dataset = task.result()
         data_table = self._dataset_to_table(dataset)
 
         self.print_info()
@@ -116,7 +177,8 @@ class OWWidgetBase(widget.OWWidget):
 
     @staticmethod
     def _fetch_dataset_exception(exception):
-        logger.exception(exception)
+        if not isinstance(exception, fetching.FetchCancelled):
+            logger.exception(exception)
 
     @QtCore.pyqtSlot(float)
     def set_progress(self, value):
@@ -133,6 +195,19 @@ class OWWidgetBase(widget.OWWidget):
         if value == 100:
             self.progressBarFinished()
 
+    @QtCore.pyqtSlot(object)
+    def set_fetch_progress(self, event):
+        """Show progress of the current dataset fetch.
+
+        Args:
+            event: fetching.ProgressEvent.
+        """
+        # Progress is finished when the fetched data is sent.
+        self.set_progress(min(math.floor(event.progress), 99))
+        self.info_data["Fetched"] = "{} values, {:.1f} MB in {:.0f} s".format(
+            event.rows, event.bytes / 2**20, event.elapsed)
+        self.print_info()
+
     def get_country_codes(self):
         """Get a list of alpha3 codes for selected countries or regions."""
         if self.country_selection:
@@ -141,15 +216,3 @@ class OWWidgetBase(widget.OWWidget):
             return [k for k, v in self.country_selection.items()
                     if v == 2 and len(str(k)) == 3]
         return []
-
-    def _dataset_progress(self, set_progress=None):
-        pass
-
-    def _start_progerss_task(self):
-        func = partial(
-            self._dataset_progress,
-            concurrent.methodinvoke(self, "set_progress", (float,))
-        )
-        progress_task = concurrent.Task(function=func)
-        progress_task.exceptionReady.connect(self._dataset_progress_exception)
-        self._executor.submit(progress_task)
@@ -0,0 +1,187 @@
+"""Process wide scheduler for background work of all WBD widgets.
+
+All widgets submit their background tasks to a single bounded thread pool,
+so that a workflow with many widgets does not start an unbounded number of
+threads. Interactive work, such as loading indicator and country lists or
+filtering, is started before queued bulk data downloads, and some threads
+are always kept free for it.
+
+Bulk tasks fetch their requests in the shared transport executor, so the
+number of fetching threads is bounded as well, and interactive requests get
+free host slots before bulk ones.
+"""
+
+import logging
+import threading
+from collections import deque
+
+from PyQt4.QtCore import QRunnable, QThreadPool
+from Orange.widgets.utils import concurrent
+
+from orangecontrib.wbd import transport
+
+logger = logging.getLogger(__name__)
+
+MAX_THREADS = 4
+# Number of threads that bulk tasks can not use.
+INTERACTIVE_THREADS = 1
+
+# Task priorities, higher priority tasks are started first.
+BULK = transport.BULK
+INTERACTIVE = transport.INTERACTIVE
+
+
+class _ScheduledRunnable(QRunnable):
+    """Runnable wrapper that keeps track of queued and running tasks."""
+
+    def __init__(self, scheduler, runnable, priority):
+        super().__init__()
+        self._scheduler = scheduler
+        self._runnable = runnable
+        self._priority = priority
+
+    def run(self):
+        self._scheduler.task_started(self._priority)
+        try:
+            self._runnable.run()
+        finally:
+            self._scheduler.task_finished(self._priority)
+
+
+class _PriorityPool(object):
+    """Thread pool interface that submits runnables with a fixed priority.
+
+    ThreadExecutor only uses the start method of its thread pool.
+    """
+
+    def __init__(self, scheduler, priority):
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def start(self, runnable):
+        self._scheduler.start(runnable, self._priority)
+
+
+class FetchScheduler(object):
+    """Bounded thread pool with task priorities and queue statistics."""
+
+    def __init__(self, max_threads=MAX_THREADS):
+        """Initialize the scheduler.
+
+        Args:
+            max_threads: Max number of tasks that run at the same time.
+        """
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self._lock = threading.Lock()
+        self._queued = {BULK: 0, INTERACTIVE: 0}
+        self._running = {BULK: 0, INTERACTIVE: 0}
+        # Bulk tasks that were passed to the pool but have not finished.
+        self._bulk_active = 0
+        self._bulk_pending = deque()
+
+    @property
+    def max_threads(self):
+        return self.pool.maxThreadCount()
+
+    @max_threads.setter
+    def max_threads(self, value):
+        self.pool.setMaxThreadCount(value)
+
+    def _bulk_limit(self):
+        return max(1, self.max_threads - INTERACTIVE_THREADS)
+
+    def start(self, runnable, priority=BULK):
+        """Queue a runnable with the given priority.
+
+        Bulk runnables wait in a separate queue while all threads that are
+        available to bulk tasks are busy.
+        """
+        with self._lock:
+            self._queued[priority] += 1
+            if priority == BULK:
+                if self._bulk_active >= self._bulk_limit():
+                    self._bulk_pending.append(runnable)
+                    return
+                self._bulk_active += 1
+        self._dispatch(runnable, priority)
+
+    def _dispatch(self, runnable, priority):
+        self.pool.start(_ScheduledRunnable(self, runnable, priority),
+                        priority)
+
+    def task_started(self, priority):
+        """Count a queued task as running."""
+        with self._lock:
+            self._queued[priority] -= 1
+            self._running[priority] += 1
+
+    def task_finished(self, priority):
+        """Count a running task as finished."""
+        runnable = None
+        with self._lock:
+            self._running[priority] -= 1
+            if priority == BULK:
+                self._bulk_active -= 1
+                if self._bulk_pending:
+                    runnable = self._bulk_pending.popleft()
+                    self._bulk_active += 1
+        if runnable is not None:
+            self._dispatch(runnable, BULK)
+
+    def executor(self, priority=BULK, parent=None):
+        """Get a ThreadExecutor that runs its tasks in this scheduler.
+
+        Args:
+            priority: BULK or INTERACTIVE.
+            parent: parent QObject of the executor.
+
+        Returns:
+            concurrent.ThreadExecutor: executor with a shared thread pool.
+        """
+        return concurrent.ThreadExecutor(
+            parent, threadPool=_PriorityPool(self, priority))
+
+    def queue_depth(self):
+        """Get the number of tasks that are waiting for a free thread."""
+        with self._lock:
+            return sum(self._queued.values())
+
+    def stats(self):
+        """Get numbers of queued and running tasks for each priority.
+
+        Returns:
+            dict: max threads and queued and running counts for bulk and
+                interactive tasks.
+        """
+        with self._lock:
+            return {
+                "max_threads": self.max_threads,
+                "queued": {"bulk": self._queued[BULK],
+                           "interactive": self._queued[INTERACTIVE]},
+                "running": {"bulk": self._running[BULK],
+                            "interactive": self._running[INTERACTIVE]},
+            }
+
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler():
+    """Get the shared scheduler."""
+    # pylint: disable=global-statement
+    # There is one scheduler per process.
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = FetchScheduler()
+        return _SCHEDULER
+
+
+def get_executor(priority=BULK, parent=None):
+    """Get an executor for the shared scheduler.
+
+    See FetchScheduler.executor for more info.
+    """
+    return get_scheduler().executor(priority, parent)
@@ -0,0 +1,249 @@
+"""Module for fetching data from World Bank APIs.
+
+All API requests should go through this module so that the number of
+concurrent connections to a single host stays bounded, regardless of how many
+threads are fetching data. Requests share a single session, so connections
+are kept alive and reused between requests to the same host.
+
+Interactive requests, such as indicator and country lists, get free host
+slots before bulk data requests. Bulk requests of all dataset fetches are run
+in one shared executor with a bounded number of threads.
+"""
+
+import json
+import time
+import logging
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HOST_CONCURRENCY = 4
+POOL_SIZE = 10
+# Number of threads for bulk requests of all dataset fetches.
+FETCH_THREADS = 8
+# Connect and read timeouts in seconds. A stalled request would otherwise
+# keep a host slot and a shared fetching thread forever.
+FETCH_TIMEOUT = (10, 60)
+
+# Request priorities, higher priority requests get host slots first.
+BULK = 0
+INTERACTIVE = 1
+
+STATUS_URL = "http://api.worldbank.org"
+STATUS_TIMEOUT = 1
+STATUS_TTL = 60  # seconds
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_status = {}
+_status_lock = threading.Lock()
+
+
+def get_session():
+    """Get the shared requests session.
+
+    The session keeps up to POOL_SIZE open connections for each host.
+    """
+    # pylint: disable=global-statement
+    # The session is shared by all API instances.
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE,
+                                  pool_maxsize=POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def set_pool_size(size):
+    """Set the number of kept alive connections per host.
+
+    The current session is closed and a new one is created on the next
+    request.
+
+    Args:
+        size: Max number of open connections for a single host.
+    """
+    # pylint: disable=global-statement
+    # The pool size is a module level setting.
+    global POOL_SIZE, _session
+    with _session_lock:
+        POOL_SIZE = size
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_executor():
+    """Get the shared executor for bulk requests.
+
+    Functions submitted to this executor must not wait for other functions
+    submitted to it, or the fetches can deadlock when all threads wait.
+    """
+    # pylint: disable=global-statement
+    # The executor is shared by all API instances.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(FETCH_THREADS)
+        return _executor
+
+
+class HostSlots(object):
+    """Bounded number of concurrent requests to a single host.
+
+    A free slot is given to waiting interactive requests before bulk ones.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._waiting = {BULK: 0, INTERACTIVE: 0}
+        self._condition = threading.Condition()
+
+    def _is_free(self, priority):
+        if self._active >= self.limit:
+            return False
+        return priority == INTERACTIVE or not self._waiting[INTERACTIVE]
+
+    def acquire(self, priority=BULK):
+        """Wait for a free slot."""
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                self._condition.wait_for(lambda: self._is_free(priority))
+                self._active += 1
+            finally:
+                self._waiting[priority] -= 1
+                # Bulk requests could wait for this interactive request.
+                self._condition.notify_all()
+
+    def release(self):
+        """Free a slot."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority=BULK):
+        """Context manager that holds a slot."""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def set_host_concurrency(limit, host=None):
+    """Set the max number of concurrent requests per host.
+
+    Args:
+        limit: Max number of concurrent requests.
+        host: Network location for which the limit is set. If None, the
+            default limit for all hosts is changed.
+    """
+    # pylint: disable=global-statement
+    # The default limit is a module level setting.
+    global HOST_CONCURRENCY
+    with _host_limits_lock:
+        if host is None:
+            HOST_CONCURRENCY = limit
+            _host_limits.clear()
+        else:
+            _host_limits[host] = HostSlots(limit)
+
+
+def host_slots(url):
+    """Get slots that limit concurrent requests to the url host."""
+    host = urllib.parse.urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = HostSlots(HOST_CONCURRENCY)
+        return _host_limits[host]
+
+
+def fetch(url, timeout=FETCH_TIMEOUT, priority=BULK):
+    """Get response text for the given url.
+
+    Args:
+        url: Url that we want to fetch.
+        timeout: Number of seconds to wait for the server, or a tuple of
+            connect and read timeouts.
+        priority: BULK or INTERACTIVE.
+
+    Returns:
+        str: Response text.
+
+    Raises:
+        requests.exceptions.RequestException: If the request failed, timed
+            out or the server responded with an error status.
+    """
+    with host_slots(url).slot(priority):
+        logger.debug("Fetching: %s", url)
+        response = get_session().get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.text
+
+
+def fetch_json(url, timeout=FETCH_TIMEOUT, priority=BULK):
+    """Get json response for the given url.
+
+    See fetch for more info.
+    """
+    return json.loads(fetch(url, timeout=timeout, priority=priority))
+
+
+def get_cached_status(url=STATUS_URL):
+    """Get the last server status if it was checked less than STATUS_TTL ago.
+
+    Returns:
+        str: "Up", "Down" or None if the status is not known.
+    """
+    with _status_lock:
+        checked, status = _status.get(url, (0, None))
+    if time.time() - checked < STATUS_TTL:
+        return status
+    return None
+
+
+def check_status(url=STATUS_URL, timeout=STATUS_TIMEOUT):
+    """Check if the server responds.
+
+    The result is shared by all widgets for STATUS_TTL seconds. The request
+    does not wait for a free host slot, so the check is not delayed by
+    running downloads.
+
+    Args:
+        url: Server url.
+        timeout: Number of seconds to wait for the response.
+
+    Returns:
+        str: "Up" if the server responded and "Down" otherwise.
+    """
+    status = get_cached_status(url)
+    if status is not None:
+        return status
+    try:
+        get_session().get(url, timeout=timeout)
+        status = "Up"
+    except requests.exceptions.RequestException:
+        logger.debug("Server status check failed for %s", url, exc_info=True)
+        status = "Down"
+    with _status_lock:
+        _status[url] = (time.time(), status)
+    return status
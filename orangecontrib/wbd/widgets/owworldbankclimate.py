@@ -5,8 +5,6 @@ world bank data API.
 """
 
 import sys
-import time
-import math
 import signal
 import logging
 
@@ -20,6 +18,7 @@ from orangecontrib.wbd.countries_and_regions import CountryTreeWidget
 from orangecontrib.wbd import api_wrapper
 from orangecontrib.wbd import countries
 from orangecontrib.wbd import owwidget_base
+from orangecontrib.wbd import transport
 
 logger = logging.getLogger(__name__)
 
@@ -209,7 +208,13 @@ class OWWorldBankClimate(owwidget_base.OWWidgetBase):
             self.include_intervals) if self.include_intervals else 2
         country_codes = self.get_country_codes()
         selected_countries = len(country_codes)
-        if types * intervals * selected_countries > 100:
+        requests = types * intervals * selected_countries
+        # Requests are fetched concurrently so the warning threshold scales
+        # with the number of requests that can run at the same time.
+        workers = 1
+        if self._api.parallel:
+            workers = min(transport.FETCH_THREADS, transport.HOST_CONCURRENCY)
+        if requests > 100 * workers:
             self.info_data[
                 "Warning"] = "Fetching data\nmight take a few minutes."
         else:
@@ -226,21 +231,18 @@ class OWWorldBankClimate(owwidget_base.OWWidgetBase):
         self.print_selection_count()
         super().commit_if()
 
-    def _fetch_dataset(self, set_progress=None):
+    def _fetch_dataset(self, progress_callback=None, cancelled=None):
         """Fetch climate dataset."""
-
-        set_progress(0)
-        self._start_progerss_task()
-
         country_codes = self.get_country_codes()
 
         logger.debug("Fetch: selected country codes: %s", country_codes)
         climate_dataset = self._api.get_instrumental(
             country_codes,
             data_types=self.include_data_types,
-            intervals=self.include_intervals
+            intervals=self.include_intervals,
+            cancelled=cancelled,
+            progress_callback=progress_callback,
         )
-        self._set_progress_flag = False
         return climate_dataset
 
     def _dataset_to_table(self, dataset):
@@ -250,21 +252,6 @@ class OWWorldBankClimate(owwidget_base.OWWidgetBase):
             use_names=self.use_country_names,
         )
 
-    def _dataset_progress(self, set_progress=None):
-        while self._set_progress_flag:
-            pages = self._api.progress["pages"]
-            current_page = self._api.progress["current_page"]
-            logger.debug("api progress: %s", self._api.progress)
-            if pages > 0:
-                progress = ((100 / pages) * (current_page - 1))
-                logger.debug("calculated progress: %s", progress)
-                set_progress(math.floor(progress))
-            time.sleep(1)
-
-    @staticmethod
-    def _dataset_progress_exception(exception):
-        logger.exception(exception)
-
 
 def main():  # pragma: no cover
     """Helper for running the widget without Orange."""
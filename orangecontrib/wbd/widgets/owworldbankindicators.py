@@ -5,11 +5,11 @@ world bank data API.
 """
 
 import sys
-import time
-import math
 import signal
 import logging
+import sqlite3
 import collections
+from functools import partial
 
 from PyQt4 import QtGui
 from PyQt4 import QtCore
@@ -17,10 +17,13 @@ from Orange.data import table
 from Orange.widgets import widget
 from Orange.widgets import gui
 from Orange.widgets.settings import Setting
+from Orange.widgets.utils import concurrent
 
 from orangecontrib.wbd.countries_and_regions import CountryTreeWidget
 from orangecontrib.wbd.indicators_list import IndicatorsTreeView
+from orangecontrib.wbd.indicators_list import FACETS
 from orangecontrib.wbd import api_wrapper
+from orangecontrib.wbd import catalog
 from orangecontrib.wbd import countries
 from orangecontrib.wbd import owwidget_base
 
@@ -75,9 +78,15 @@ class OWWorldBankIndicators(owwidget_base.OWWidgetBase):
         b'\x00\x00\x02\x10\x01\x00\x00\x00\x07\x01\x00\x00\x00\x01'
     ))
 
+    # Delay in milliseconds between the last key press and filtering.
+    FILTER_DELAY = 200
+
     def __init__(self):
         super().__init__()
         self._api = api_wrapper.IndicatorAPI()
+        self._country_snapshot = None
+        self._country_task = None
+        self._filter_task = None
         self._init_layout()
         self._check_server_status()
 
@@ -98,6 +107,18 @@ class OWWorldBankIndicators(owwidget_base.OWWidgetBase):
 
         gui.separator(indicator_filter_box)
 
+        facet_box = gui.widgetBox(self.controlArea, "Facets", addSpace=True)
+        self.facet_combos = collections.OrderedDict()
+        for facet in FACETS:
+            gui.widgetLabel(facet_box, facet)
+            combo = QtGui.QComboBox(facet_box)
+            combo.setSizeAdjustPolicy(
+                QtGui.QComboBox.AdjustToMinimumContentsLength)
+            combo.setMinimumContentsLength(20)
+            combo.activated.connect(self.facet_selected)
+            facet_box.layout().addWidget(combo)
+            self.facet_combos[facet] = combo
+
         output_box = gui.widgetBox(self.controlArea, "Output", addSpace=True)
         gui.radioButtonsInBox(output_box, self, "output_type",
                               ["Countries", "Time Series"], "Rows",
@@ -119,6 +140,13 @@ class OWWorldBankIndicators(owwidget_base.OWWidgetBase):
             caseSensitivity=QtCore.Qt.CaseInsensitive)
         self.completer.setModel(QtGui.QStringListModel(self))
         self.filter_text.setCompleter(self.completer)
+        self.filter_text.setToolTip(
+            "The list of all indicators is searched for words that start "
+            "with the filter text.\nIf there are none, and in other lists, "
+            "indicators that contain the filter text are shown.")
+        self._filter_timer = QtCore.QTimer(
+            self, singleShot=True, interval=self.FILTER_DELAY)
+        self._filter_timer.timeout.connect(self._start_filter)
 
         spliter_v = QtGui.QSplitter(QtCore.Qt.Vertical, self.mainArea)
 
@@ -143,7 +171,11 @@ class OWWorldBankIndicators(owwidget_base.OWWidgetBase):
             default_colapse=True,
         )
         box.layout().addWidget(self.country_tree)
-        self.country_tree.set_data(countries.get_countries_regions_dict())
+        self._country_snapshot = countries.get_country_snapshot()
+        if self._country_snapshot is not None:
+            self.country_tree.set_data(
+                countries.get_countries_regions_dict(self._country_snapshot))
+        self._refresh_countries()
 
         self.splitters = spliter_v, splitter_h
 
@@ -155,14 +187,118 @@ class OWWorldBankIndicators(owwidget_base.OWWidgetBase):
 
         self.progressBarInit()
 
+    def _refresh_countries(self):
+        """Fetch the country catalog in the background."""
+        self._country_task = concurrent.Task(
+            function=countries.get_country_catalog)
+        self._country_task.resultReady.connect(self._countries_refreshed)
+        self._country_task.exceptionReady.connect(
+            self._fetch_dataset_exception)
+        self._interactive_executor.submit(self._country_task)
+
+    @QtCore.pyqtSlot(object)
+    def _countries_refreshed(self, catalog):
+        """Update the country tree if the country catalog has changed."""
+        if catalog != self._country_snapshot:
+            self._country_snapshot = catalog
+            self.country_tree.set_data(
+                countries.get_countries_regions_dict(catalog))
+
     def filter_indicator_list(self):
-        """Set the proxy model filter and update info box."""
-        filter_string = self.filter_text.text()
+        """Filter the indicator list after the filter text stops changing."""
+        self._filter_timer.start()
+
+    def _filter_strings(self):
+        return tuple(self.filter_text.text().lower().strip().split())
+
+    def _start_filter(self):
+        """Compute the indicator list filter in the background.
+
+        The list of all indicators is filtered with a ranked search in the
+        indicator catalog, and other lists with substring matching.
+
+        A pending filter task is cancelled, and a running one is left to
+        finish, but its result is ignored.
+        """
         proxy_model = self.indicator_widget.model()
-        if proxy_model:
-            strings = filter_string.lower().strip().split()
-            proxy_model.setFilterFixedStrings(strings)
-            self.print_info()
+        if not proxy_model or proxy_model.sourceModel() is None:
+            return
+        if self._filter_task is not None:
+            self._filter_task.future().cancel()
+        strings = self._filter_strings()
+        if strings and self.basic_indicator_filter() == "All":
+            function = partial(self._catalog_filter, proxy_model, strings)
+        else:
+            function = partial(proxy_model.filter_mask, strings)
+        self._filter_task = concurrent.Task(function=function)
+        self._filter_task.resultReady.connect(self._filter_finished)
+        self._filter_task.exceptionReady.connect(
+            self._fetch_dataset_exception)
+        self._interactive_executor.submit(self._filter_task)
+
+    @staticmethod
+    def _catalog_filter(proxy_model, strings):
+        """Filter indicators with a ranked search in the indicator catalog.
+
+        The catalog matches word prefixes. Substring matching, as used for
+        other lists, is used if no indicators match, so that parts of words
+        (e.g. "ulation") still find indicators. It is also used if the
+        catalog is empty, has no full text index or can not be read.
+        """
+        try:
+            indicator_catalog = catalog.get_catalog()
+            if indicator_catalog.has_fts and len(indicator_catalog):
+                result = proxy_model.filter_ids(
+                    strings, indicator_catalog.search_ids(" ".join(strings)))
+                if result.ranked:
+                    return result
+        except sqlite3.Error:
+            logger.exception("Failed to search the indicator catalog.")
+        return proxy_model.filter_mask(strings)
+
+    @QtCore.pyqtSlot(object)
+    def _filter_finished(self, result):
+        """Set the proxy model filter if it matches the current filter text."""
+        if result.strings != self._filter_strings():
+            return
+        if not self.indicator_widget.model().set_filter_result(result):
+            return
+        header = self.indicator_widget.header()
+        if result.ranked is not None:
+            # Rows are ordered by relevance and not by any column.
+            header.setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        elif header.sortIndicatorSection() == -1:
+            self.indicator_widget.sortByColumn(1, QtCore.Qt.DescendingOrder)
+        self.print_info()
+
+    def set_facets(self, facet_values):
+        """Show facet values of a new indicator list.
+
+        Selected values are kept if they exist in the new list.
+
+        Args:
+            facet_values: dict of sorted values for each facet.
+        """
+        for facet, combo in self.facet_combos.items():
+            selected = combo.currentText()
+            combo.clear()
+            combo.addItem("All")
+            combo.addItems(facet_values.get(facet, []))
+            combo.setCurrentIndex(max(combo.findText(selected), 0))
+
+    def facet_selection(self):
+        """Get selected value for each facet that is not set to All."""
+        return {facet: combo.currentText()
+                for facet, combo in self.facet_combos.items()
+                if combo.currentIndex() > 0}
+
+    def facet_selected(self):
+        """Show only indicators that match selected facet values."""
+        proxy_model = self.indicator_widget.model()
+        source_model = proxy_model.sourceModel()
+        if source_model is not None:
+            proxy_model.set_facet_mask(
+                source_model.facet_mask(self.facet_selection()))
 
     def output_type_selected(self):
         self.commit_if()
@@ -183,58 +319,24 @@ class OWWorldBankIndicators(owwidget_base.OWWidgetBase):
         self.splitterSettings = [bytes(sp.saveState())
                                  for sp in self.splitters]
 
-    def _fetch_dataset(self, set_progress=None):
+    def _fetch_dataset(self, progress_callback=None, cancelled=None):
         """Fetch indicator dataset."""
-        set_progress(0)
-        self._start_progerss_task()
-
         country_codes = self.get_country_codes()
-
-        if len(country_codes) > 250:
-            country_codes = None
         logger.debug("Fetch: selected country codes: %s", country_codes)
         logger.debug("Fetch: selected indicators: %s",
                      self.indicator_selection)
-        indicator_dataset = self._api.get_dataset(self.indicator_selection,
-                                                  countries=country_codes)
-        self._set_progress_flag = False
-        return indicator_dataset
+        return self._api.get_dataset(
+            self.indicator_selection,
+            countries=country_codes,
+            streaming=True,
+            cancelled=cancelled,
+            progress_callback=progress_callback,
+        )
 
     def _dataset_to_table(self, dataset):
         time_series = self.output_type == 1
         return dataset.as_orange_table(time_series=time_series)
 
-    @staticmethod
-    def _fetch_dataset_exception(exception):
-        logger.exception(exception)
-
-    def _dataset_progress(self, set_progress=None):
-        """Update dataset download progress.
-
-        This function reads the progress state from the world bank API and sets
-        the current widgets progress to that. All This thread should only read
-        data and ask the GUI thread to update the progress for this to be
-        thread safe.
-        """
-        while self._set_progress_flag:
-            indicators = self._api.progress["indicators"]
-            current_indicator = self._api.progress["current_indicator"]
-            indicator_pages = self._api.progress["indicator_pages"]
-            current_page = self._api.progress["current_page"]
-            logger.debug("api progress: %s", self._api.progress)
-            if indicator_pages > 0 and indicators > 0:
-                progress = (
-                    ((100 / indicators) * (current_indicator - 1)) +
-                    (100 / indicators) * (current_page / indicator_pages)
-                )
-                logger.debug("calculated progress: %s", progress)
-                set_progress(math.floor(progress))
-            time.sleep(1)
-
-    def _dataset_progress_exception(self, exception):
-        logger.exception(exception)
-        self.print_info()
-
 
 def main():  # pragma: no cover
     """Helper for running the widget without Orange."""
@@ -0,0 +1,362 @@
+"""Tests for extended indicator and climate datasets."""
+
+# pylint: disable=protected-access
+
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from unittest import mock
+
+import numpy
+
+from orangecontrib.wbd import api_wrapper
+from orangecontrib.wbd import cache
+from orangecontrib.wbd import fetching
+from orangecontrib.wbd import transport
+
+
+def _point(country, date, value):
+    return {"country": {"value": country}, "date": date, "value": value}
+
+
+class TestIndicatorDataset(unittest.TestCase):
+    """Tests for numeric indicator dataset representation."""
+
+    def setUp(self):
+        self.dataset = api_wrapper.IndicatorDataset(
+            {
+                "ind1": [
+                    _point("Slovenia", "2001", "1"),
+                    _point("Austria", "2001", None),
+                    _point("Slovenia", "2000", "0"),
+                    _point("Austria", "2002", "3"),
+                ],
+                "ind2": [
+                    _point("Austria", "2001", "5"),
+                ],
+            },
+            [{"name": "Austria", "region": {"value": "Europe"},
+              "longitude": "16.3", "latitude": ""}],
+        )
+
+    def test_as_numeric(self):
+        """Test country rows and removal of empty columns."""
+        data = self.dataset.as_numeric()
+        self.assertEqual(data.rows.tolist(), ["Austria", "Slovenia"])
+        self.assertEqual(data.columns.tolist(),
+                         ["ind1 - 2001", "ind1 - 2002", "ind2 - 2001"])
+        self.assertEqual(data.X.dtype, numpy.float64)
+        numpy.testing.assert_equal(data.X, [[numpy.nan, 3, 5],
+                                            [1, numpy.nan, numpy.nan]])
+
+    def test_as_numeric_time_series(self):
+        """Test date rows with indicator and country columns."""
+        data = self.dataset.as_numeric(time_series=True)
+        self.assertEqual(data.rows.tolist(), ["2000", "2001", "2002"])
+        self.assertEqual(
+            data.columns.tolist(),
+            ["ind1 - Austria", "ind1 - Slovenia", "ind2 - Austria"])
+        numpy.testing.assert_equal(data.X, [[numpy.nan, 0, numpy.nan],
+                                            [numpy.nan, 1, 5],
+                                            [3, numpy.nan, numpy.nan]])
+
+    def test_responses_ingested_once(self):
+        """Test that responses are added to the buffer once and dropped."""
+        self.assertEqual(self.dataset.api_responses, {})
+        with mock.patch.object(fetching.IndicatorBuffer, "add_page") as add:
+            self.dataset.as_numeric()
+            self.dataset.as_numeric(time_series=True)
+        add.assert_not_called()
+
+    def test_metadata(self):
+        """Test country metadata columns."""
+        metadata = self.dataset.as_numeric(add_metadata=True).metadata
+        self.assertEqual(metadata["Country"].tolist(),
+                         ["Austria", "Slovenia"])
+        self.assertEqual(metadata["Region"].tolist(), ["Europe", ""])
+        numpy.testing.assert_equal(metadata["Longitude"], [16.3, numpy.nan])
+
+
+def _climate_response(key_name, values):
+    return {"response": [{key_name: key, "data": value}
+                         for key, value in values]}
+
+
+class TestClimateDataset(unittest.TestCase):
+    """Tests for numeric climate dataset representation."""
+
+    def setUp(self):
+        self.dataset = api_wrapper.ClimateDataset({
+            "SVN": {
+                "tas": {
+                    "year": _climate_response("year", [(1990, 10.5),
+                                                       (1991, 11)]),
+                    "month": _climate_response("month", [(0, -1.5)]),
+                },
+                "pr": {
+                    "year": _climate_response("year", [(1990, 0),
+                                                       (1991, 2)]),
+                    "month": _climate_response("month", [(0, 3)]),
+                },
+            },
+            "AUT": {
+                "tas": {
+                    "year": _climate_response("year", [(1990, 8),
+                                                       (1991, None)]),
+                    "month": _climate_response("month", [(0, -4)]),
+                },
+                "pr": {
+                    "year": _climate_response("year", [(1990, 0),
+                                                       (1991, 1)]),
+                    "month": _climate_response("month", [(0, 5)]),
+                },
+            },
+        })
+
+    def test_as_numeric(self):
+        """Test that labels match as_list and empty columns are dropped."""
+        data = self.dataset.as_numeric()
+        self.assertEqual(data.rows, ["AUT", "SVN"])
+        # Same labels as in the as_list header, without "pr - year - 1990".
+        self.assertEqual(data.columns, [
+            "pr - month - 0", "pr - year - 1991", "tas - month - 0",
+            "tas - year - 1990", "tas - year - 1991"])
+        numpy.testing.assert_equal(data.X[0], [5, 1, -4, 8, numpy.nan])
+        numpy.testing.assert_equal(data.X[1], [3, 2, -1.5, 10.5, 11])
+
+    def test_as_numeric_time_series(self):
+        """Test interval rows with country and data type columns."""
+        data = self.dataset.as_numeric(time_series=True)
+        self.assertEqual(data.rows,
+                         [("month", 0), ("year", 1990), ("year", 1991)])
+        self.assertEqual(data.columns, ["AUT - pr", "AUT - tas", "SVN - pr",
+                                        "SVN - tas"])
+        numpy.testing.assert_equal(data.X[1], [0, 8, 0, 10.5])
+
+    def test_interval_epochs(self):
+        """Test that only yearly rows get dates."""
+        epochs = api_wrapper.ClimateDataset._interval_epochs(
+            [("month", 0), ("year", 1990), ("decade", 2000)])
+        numpy.testing.assert_equal(epochs, [numpy.nan, 631152000, 946684800])
+
+
+class TestEncoding(unittest.TestCase):
+    """Tests for discrete value encoding helpers."""
+
+    def test_encode_discrete(self):
+        """Test sorted categories and missing values."""
+        categories, codes = api_wrapper.encode_discrete(
+            numpy.array(["b", "", "a", "b"], dtype=object))
+        self.assertEqual(categories, ["a", "b"])
+        numpy.testing.assert_equal(codes, [1, numpy.nan, 0, 1])
+
+    def test_map_values(self):
+        """Test mapping with missing keys."""
+        mapped = api_wrapper.map_values(
+            ["AUT", "SVN", "AUT", "XKX"],
+            {"AUT": "Austria", "SVN": "Slovenia"},
+        )
+        self.assertEqual(mapped.tolist(),
+                         ["Austria", "Slovenia", "Austria", "XKX"])
+
+    def test_dates_to_epoch(self):
+        """Test parsing years, quarters, months and invalid periods."""
+        epochs = api_wrapper.dates_to_epoch(
+            ["1970", "1970Q2", "1970M2", "Last Known Value", "1970"])
+        numpy.testing.assert_equal(
+            epochs, [0, 7776000, 2678400, numpy.nan, 0])
+        epochs = api_wrapper.dates_to_epoch(["1988-2000"], invalid=-1)
+        numpy.testing.assert_equal(epochs, [-1])
+
+
+COUNTRIES = [
+    {"id": "SVN", "iso2Code": "SI", "name": "Slovenia"},
+    {"id": "HRV", "iso2Code": "HR", "name": "Croatia"},
+    {"id": "AUT", "iso2Code": "AT", "name": "Austria"},
+    {"id": "ITA", "iso2Code": "IT", "name": "Italy"},
+]
+
+
+class ApiTestCase(unittest.TestCase):
+    """Base test case with api caches in a temporary directory."""
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        patcher = mock.patch.object(
+            cache, "get_cache",
+            lambda name, ttl=cache.CACHE_TIME: cache.ResponseCache(
+                name, ttl=ttl, cache_dir=cache_dir))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestRequestPlan(ApiTestCase):
+    """Tests for planning indicator requests."""
+
+    def setUp(self):
+        super().setUp()
+        self.api = api_wrapper.IndicatorAPI()
+        self.api.get_countries = lambda: COUNTRIES
+
+    def test_country_codes(self):
+        """Test that a small selection is joined into one request."""
+        plan = self.api._plan_request({"svn"})
+        self.assertEqual(plan.countries, "SVN")
+        self.assertIsNone(plan.country_filter)
+        self.assertEqual(plan.per_page, self.api.MIN_PER_PAGE)
+
+    def test_all_countries(self):
+        """Test that large selections use all countries with a filter."""
+        plan = self.api._plan_request({"svn", "hrv", "aut"})
+        self.assertEqual(plan.countries, "all")
+        points = [
+            {"country": {"id": "SI", "value": "Slovenia"}, "value": 1},
+            {"country": {"id": "IT", "value": "Italy"}, "value": 2},
+            {"country": {"id": "XX", "value": "Austria"}, "value": 3},
+        ]
+        filtered = self.api._filter_points(points, plan.country_filter)
+        self.assertEqual([point["value"] for point in filtered], [1, 3])
+
+        plan = self.api._plan_request(set())
+        self.assertEqual(plan.countries, "all")
+        self.assertIsNone(plan.country_filter)
+
+
+def _fake_fetch(url, timeout=None):
+    """Get three pages of data for any indicator except "fail"."""
+    # pylint: disable=unused-argument
+    path, _, query = url.partition("?")
+    indicator = path.rstrip("/").split("/")[-1]
+    if indicator == "fail":
+        raise ValueError("Failed request")
+    page = int(urllib.parse.parse_qs(query)["page"][0])
+    data = [
+        {"country": {"id": country["iso2Code"], "value": country["name"]},
+         "date": str(2000 + page), "value": page + index}
+        for index, country in enumerate(COUNTRIES[:2])
+    ]
+    return json.dumps([{"page": page, "pages": 3}, data])
+
+
+class TestGetDataset(ApiTestCase):
+    """Tests for concurrent indicator fetching."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(transport, "fetch", _fake_fetch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_dataset(self, parallel=True, **kwargs):
+        api = api_wrapper.IndicatorAPI(parallel)
+        api.get_countries = lambda: COUNTRIES
+        with self.assertLogs(api_wrapper.logger, "WARNING"):
+            return api.get_dataset(["ind1", "fail", "ind2"],
+                                   countries=["SVN", "HRV"], **kwargs)
+
+    def assert_same_data(self, data, expected):
+        """Assert that two IndicatorData tuples have the same values."""
+        self.assertEqual(list(data.rows), list(expected.rows))
+        self.assertEqual(list(data.columns), list(expected.columns))
+        numpy.testing.assert_equal(data.X, expected.X)
+
+    def test_sequential(self):
+        """Test that sequential fetching gives the same data."""
+        self.assert_same_data(self._get_dataset(parallel=False).as_numeric(),
+                              self._get_dataset().as_numeric())
+
+    def test_all_pages(self):
+        """Test that all pages are added and failed indicators dropped."""
+        dataset = self._get_dataset()
+        self.assertEqual(dataset.api_responses, {})
+        data = dataset.as_numeric()
+        self.assertEqual(list(data.rows), ["Croatia", "Slovenia"])
+        self.assertEqual(list(data.columns), [
+            "ind1 - 2001", "ind1 - 2002", "ind1 - 2003",
+            "ind2 - 2001", "ind2 - 2002", "ind2 - 2003"])
+        numpy.testing.assert_equal(data.X, [[2, 3, 4, 2, 3, 4],
+                                            [1, 2, 3, 1, 2, 3]])
+
+    def test_streaming(self):
+        """Test that streaming gives the same data as collected pages."""
+        self.assert_same_data(self._get_dataset(streaming=True).as_numeric(),
+                              self._get_dataset().as_numeric())
+
+    def test_progress(self):
+        """Test that every fetched page is reported."""
+        events = []
+        api = api_wrapper.IndicatorAPI()
+        api.get_countries = lambda: COUNTRIES
+        api.get_dataset(["ind1", "ind2"], countries=["SVN", "HRV"],
+                        progress_callback=events.append)
+        self.assertEqual(len(events), 6)
+        self.assertEqual(max(event.progress for event in events), 100)
+        self.assertEqual(max(event.rows for event in events), 12)
+
+    def test_cancel(self):
+        """Test that a cancelled fetch raises FetchCancelled."""
+        cancelled = threading.Event()
+        cancelled.set()
+        api = api_wrapper.IndicatorAPI()
+        api.get_countries = lambda: COUNTRIES
+        self.assertRaises(fetching.FetchCancelled, api.get_dataset,
+                          ["ind1", "ind2"], cancelled=cancelled)
+
+
+def _fake_climate_fetch(url, timeout=None):
+    """Get yearly data for basin 1 and an error for other basins."""
+    # pylint: disable=unused-argument
+    _, data_type, interval, location = url.split("/")[-4:]
+    if location == "3":
+        raise ValueError("Failed request")
+    if location != "1":
+        return json.dumps({"error": "Invalid request"})
+    if interval == "month":
+        return json.dumps([{"month": 0, "data": 1.5}])
+    value = 10.0 if data_type == "tas" else 100.0
+    return json.dumps([{"year": 1990, "data": value},
+                       {"year": 1991, "data": value + 1}])
+
+
+class TestGetInstrumental(ApiTestCase):
+    """Tests for concurrent climate data fetching."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(transport, "fetch", _fake_climate_fetch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api = api_wrapper.ClimateAPI()
+
+    def test_merge(self):
+        """Test that all request responses are merged into the dataset."""
+        events = []
+        dataset = self.api.get_instrumental(["1"],
+                                            progress_callback=events.append)
+        responses = dataset.api_responses["1"]
+        self.assertEqual(sorted(responses), ["pr", "tas"])
+        self.assertEqual(sorted(responses["tas"]), ["month", "year"])
+        self.assertEqual(responses["tas"]["year"]["response"][1]["data"],
+                         11.0)
+        self.assertEqual(len(events), 4)
+        self.assertEqual(max(event.progress for event in events), 100)
+        self.assertEqual(max(event.rows for event in events), 6)
+
+    def test_failed_requests(self):
+        """Test that failed requests are left out and errors not cached."""
+        events = []
+        with self.assertLogs(api_wrapper.logger, "WARNING"):
+            dataset = self.api.get_instrumental(
+                ["1", "2", "3"], data_types=["tas"], intervals=["year"],
+                progress_callback=events.append)
+        self.assertEqual(sorted(dataset.api_responses), ["1", "2"])
+        # Failed requests are finished too.
+        self.assertEqual(max(event.progress for event in events), 100)
+        self.assertIsNotNone(self.api.cache.get(cache.normalize_key(
+            "instrumental", "1", "tas", "year")))
+        self.assertIsNone(self.api.cache.get(cache.normalize_key(
+            "instrumental", "2", "tas", "year")))
@@ -0,0 +1,106 @@
+"""Tests for persistent response cache."""
+
+# pylint: disable=protected-access
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from orangecontrib.wbd import cache
+
+
+class TestResponseCache(unittest.TestCase):
+    """Tests for ResponseCache expiry and eviction."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_normalize_key(self):
+        """Test that key does not depend on the order of countries."""
+        self.assertEqual(
+            cache.normalize_key("indicator", "SP.POP", ["SVN", "aut"]),
+            cache.normalize_key("indicator", "sp.pop", ["AUT", "svn"]),
+        )
+        self.assertNotEqual(
+            cache.normalize_key("indicator", "SP.POP", ["SVN"]),
+            cache.normalize_key("indicator", "SP.POP", ["AUT"]),
+        )
+
+    def test_hits_and_misses(self):
+        """Test getting values and hit counters."""
+        response_cache = cache.ResponseCache("test", cache_dir=self.cache_dir)
+        self.assertIsNone(response_cache.get("a"))
+        response_cache.set("a", [1, 2, {"b": "c"}])
+        self.assertEqual(response_cache.get("a"), [1, 2, {"b": "c"}])
+        self.assertEqual(response_cache.stats["hits"], 1)
+        self.assertEqual(response_cache.stats["misses"], 1)
+
+        reloaded_cache = cache.ResponseCache("test", cache_dir=self.cache_dir)
+        self.assertEqual(reloaded_cache.get("a"), [1, 2, {"b": "c"}])
+
+    def test_expiry(self):
+        """Test that expired values are removed."""
+        response_cache = cache.ResponseCache(
+            "test", ttl=0.01, cache_dir=self.cache_dir)
+        response_cache.set("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(response_cache.get("a"))
+        self.assertEqual(response_cache.stats["entries"], 0)
+
+    def test_lru_eviction(self):
+        """Test that least recently used entries are evicted first."""
+        response_cache = cache.ResponseCache(
+            "test", max_size=150, cache_dir=self.cache_dir)
+        response_cache.set("a", "a" * 20)
+        response_cache.set("b", "b" * 20)
+        response_cache.get("a")
+        response_cache.set("c", "c" * 20)
+        self.assertEqual(response_cache.get("a"), "a" * 20)
+        self.assertIsNone(response_cache.get("b"))
+        self.assertEqual(response_cache.get("c"), "c" * 20)
+
+    def test_invalid_files(self):
+        """Test that missing and corrupt files are treated as misses."""
+        response_cache = cache.ResponseCache(
+            "test", ttl=float("inf"), cache_dir=self.cache_dir)
+        response_cache.set("a", 1)
+        response_cache.set("b", 2)
+        os.remove(response_cache._path("a"))
+        with open(response_cache._path("b"), "w") as file_:
+            file_.write("{invalid")
+        with self.assertLogs(cache.logger, "WARNING"):
+            self.assertIsNone(response_cache.get("b"))
+        self.assertIsNone(response_cache.get("a"))
+        self.assertEqual(response_cache.stats["misses"], 2)
+        self.assertEqual(response_cache.stats["entries"], 0)
+        self.assertEqual(response_cache.stats["size"], 0)
+
+    def test_read_without_lock(self):
+        """Test that other threads can use the cache during a file read."""
+        response_cache = cache.ResponseCache("test", cache_dir=self.cache_dir)
+        response_cache.set("a", 1)
+        acquired = []
+
+        def try_lock():
+            if response_cache._lock.acquire(timeout=1):
+                acquired.append(True)
+                response_cache._lock.release()
+
+        def open_file(*args, **kwargs):
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return open(*args, **kwargs)
+
+        with mock.patch.object(cache, "open", open_file, create=True):
+            self.assertEqual(response_cache.get("a"), 1)
+        self.assertEqual(acquired, [True])
+        # Temporary files of atomic writes are not left behind.
+        self.assertEqual(os.listdir(response_cache._directory), ["a.json"])
@@ -0,0 +1,81 @@
+"""Tests for local indicator catalog."""
+
+import shutil
+import sqlite3
+import os
+import tempfile
+import unittest
+
+from orangecontrib.wbd import catalog
+
+
+def _indicator(id_, name, note="", topics=()):
+    return {
+        "id": id_,
+        "name": name,
+        "source": {"id": "2", "value": "World Development Indicators"},
+        "sourceNote": note,
+        "sourceOrganization": "World Bank",
+        "topics": [{"id": "1", "value": topic} for topic in topics],
+    }
+
+
+class TestIndicatorCatalog(unittest.TestCase):
+    """Tests for catalog updates and search."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.catalog = catalog.IndicatorCatalog(
+            os.path.join(self.directory, "indicators.sqlite"))
+        self.catalog.update([
+            _indicator("SP.POP.TOTL", "Population, total",
+                       topics=["Health"]),
+            _indicator("NY.GDP.MKTP.CD", "GDP (current US$)",
+                       note="Population is not used here."),
+            _indicator("EN.POP.DNST", "Population density"),
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_update(self):
+        """Test incremental updates and removal of missing indicators."""
+        counts = self.catalog.update([
+            _indicator("SP.POP.TOTL", "Population, total",
+                       topics=["Health"]),
+            _indicator("EN.POP.DNST", "Population density (people)"),
+        ], remove_missing=True)
+        self.assertEqual(counts, {"added": 0, "updated": 1, "removed": 1})
+        self.assertEqual(len(self.catalog), 2)
+        self.assertEqual(
+            self.catalog.get(["EN.POP.DNST"])["EN.POP.DNST"]["name"],
+            "Population density (people)")
+        self.assertEqual(
+            [ind["id"] for ind in self.catalog.search("people")],
+            ["EN.POP.DNST"])
+
+    def test_search(self):
+        """Test prefix matching and ranking by name."""
+        ids = [ind["id"] for ind in self.catalog.search("popul")]
+        self.assertEqual(set(ids[:2]), {"SP.POP.TOTL", "EN.POP.DNST"})
+        self.assertEqual(ids[2], "NY.GDP.MKTP.CD")
+        self.assertEqual(
+            [ind["id"] for ind in self.catalog.search("health pop")],
+            ["SP.POP.TOTL"])
+        self.assertEqual(len(self.catalog.search("popul", limit=1)), 1)
+        self.assertEqual(self.catalog.search("  "), [])
+
+    def test_search_ids(self):
+        """Test that id search matches full search."""
+        self.assertEqual(
+            self.catalog.search_ids("popul"),
+            [ind["id"] for ind in self.catalog.search("popul")])
+
+    def test_reindex(self):
+        """Test indexing rows that were stored without a full text index."""
+        with sqlite3.connect(self.catalog.path) as conn:
+            conn.execute("DROP TABLE indicators_fts")
+        reopened = catalog.IndicatorCatalog(self.catalog.path)
+        self.assertEqual(reopened.search_ids("density"), ["EN.POP.DNST"])
+        reopened = catalog.IndicatorCatalog(self.catalog.path)
+        self.assertEqual(reopened.search_ids("density"), ["EN.POP.DNST"])
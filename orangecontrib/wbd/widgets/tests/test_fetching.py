@@ -0,0 +1,30 @@
+"""Tests for fetch progress and cancellation."""
+
+import threading
+import unittest
+
+from orangecontrib.wbd import fetching
+
+
+class TestFetchProgress(unittest.TestCase):
+    """Tests for progress events and cancellation."""
+
+    def test_update(self):
+        """Test progress of partially fetched parts."""
+        events = []
+        fetch = fetching.FetchProgress(2, callback=events.append)
+        fetch.add_bytes(100)
+        fetch.update("ind1", total=4, rows=10)
+        event = fetch.update("ind2", rows=5)
+        self.assertEqual(len(events), 2)
+        self.assertEqual(event.progress, 62.5)
+        self.assertEqual((event.rows, event.bytes), (15, 100))
+        self.assertEqual((fetch.steps, fetch.steps_total), (2, 5))
+
+    def test_cancel(self):
+        """Test that a set event cancels the fetch."""
+        cancelled = threading.Event()
+        fetch = fetching.FetchProgress(1, cancelled=cancelled)
+        fetch.check_cancelled()
+        cancelled.set()
+        self.assertRaises(fetching.FetchCancelled, fetch.check_cancelled)
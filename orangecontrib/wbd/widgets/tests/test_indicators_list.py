@@ -0,0 +1,425 @@
+"""Tests for indicator list helpers."""
+
+# pylint: disable=protected-access
+
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from PyQt4 import QtCore
+from PyQt4 import QtGui
+
+from orangecontrib.wbd import cache
+from orangecontrib.wbd import catalog
+from orangecontrib.wbd import indicators_list
+
+WORDS = ["population", "popular", "gdp", "growth", "health", "income",
+         "urban", "rural", "total"]
+TOPICS = ["Health", "Economy", "Environment"]
+SOURCES = ["World Development Indicators", "Gender Statistics"]
+
+
+def _indicator_data(count=200):
+    """Get a reproducible list of indicators with varied names and ids."""
+    rng = random.Random(0)
+    data = []
+    for index in range(count):
+        if index % 3:
+            id_ = "SP.{}.{}".format(rng.choice(WORDS).upper(), index)
+        else:
+            id_ = "GDS{}".format(rng.randint(1, 1000) * 1000 + index)
+        data.append({
+            "id": id_,
+            "name": " ".join(rng.sample(WORDS, 3)).capitalize(),
+            "topics": [{"value": topic}
+                       for topic in rng.sample(TOPICS, rng.randint(0, 2))],
+            "source": {"value": rng.choice(SOURCES)},
+            "sourceOrganization": "",
+        })
+    return data
+
+
+def _table_model(data):
+    return indicators_list.IndicatorTableModel(
+        indicators_list.get_indicator_rows(data),
+        facets=indicators_list.get_indicator_facets(data))
+
+
+def _tree_view():
+    """Create an indicator view that does not fetch indicators."""
+    main_widget = mock.MagicMock()
+    main_widget.indicator_description = QtGui.QTextEdit()
+    with mock.patch.object(indicators_list.IndicatorsTreeView,
+                           "fetch_indicators"):
+        return indicators_list.IndicatorsTreeView(None, main_widget)
+
+
+class ModelTestCase(unittest.TestCase):
+    """Base test case with an indicator model and a filter proxy."""
+
+    def setUp(self):
+        self.data = _indicator_data()
+        self.model = _table_model(self.data)
+        self.proxy = indicators_list.MySortFilterProxyModel()
+        self.proxy.setSourceModel(self.model)
+
+    def brute_force_mask(self, strings):
+        """Get data rows that contain all strings with a plain scan."""
+        return [all(string in text for string in strings)
+                for text in self.model.filter_texts()]
+
+    def shown_ids(self):
+        """Get indicator ids of rows shown by the proxy in display order."""
+        return [self.proxy.index(row, 1).data()
+                for row in range(self.proxy.rowCount())]
+
+    def ids_in_mask(self, mask):
+        """Get indicator ids of data rows in the mask."""
+        return {self.data[row]["id"].strip()
+                for row, accepted in enumerate(mask) if accepted}
+
+
+class TestFilterMask(ModelTestCase):
+    """Tests for filtering indicators by substrings."""
+
+    def test_filter_mask(self):
+        """Test that filter masks match a brute force substring search."""
+        for strings in [("pop",), ("ulation",), ("gdp", "health"),
+                        ("sp.", "gender"), ("missing",)]:
+            result = self.proxy.filter_mask(strings)
+            self.assertEqual(result.mask.tolist(),
+                             self.brute_force_mask(strings))
+            self.assertIsNone(result.ranked)
+            self.assertTrue(self.proxy.set_filter_result(result))
+            self.assertEqual(set(self.shown_ids()),
+                             self.ids_in_mask(result.mask))
+
+    def test_no_strings(self):
+        """Test that an empty filter shows all rows."""
+        self.proxy.set_filter_result(self.proxy.filter_mask(["gdp"]))
+        result = self.proxy.filter_mask([])
+        self.assertIsNone(result.mask)
+        self.proxy.set_filter_result(result)
+        self.assertEqual(self.proxy.rowCount(), len(self.data))
+
+
+class _CountingList(list):
+    """List that counts item lookups."""
+
+    lookups = 0
+
+    def __getitem__(self, index):
+        self.lookups += 1
+        return super().__getitem__(index)
+
+
+class TestIncrementalFilter(ModelTestCase):
+    """Tests for narrowing filter results from previous strings."""
+
+    def test_narrow_and_widen(self):
+        """Test that results match brute force while typing and deleting."""
+        for string in ["p", "po", "pop", "popu", "popul", "pop", "p", "",
+                       "u", "ul", "ula", "opulation", "pulation"]:
+            strings = (string,) if string else ()
+            result = self.proxy.filter_mask(strings)
+            self.proxy.set_filter_result(result)
+            expected = self.brute_force_mask(strings)
+            if strings:
+                self.assertEqual(result.mask.tolist(), expected, string)
+            self.assertEqual(set(self.shown_ids()),
+                             self.ids_in_mask(expected), string)
+
+    def test_narrowing_checks_previous_rows(self):
+        """Test that a longer string only checks rows of a previous one."""
+        base = self.proxy.filter_mask(["pop"]).mask
+        row_text = _CountingList(self.proxy._row_text)
+        self.proxy._row_text = row_text
+        mask = self.proxy.filter_mask(["popul"]).mask
+        self.assertEqual(row_text.lookups, base.sum())
+        self.assertEqual(mask.tolist(), self.brute_force_mask(["popul"]))
+        self.assertFalse(mask.flags.writeable)
+
+    def test_recent_strings(self):
+        """Test that only the most recent strings are kept."""
+        self.proxy.PREFIX_CACHE_SIZE = 2
+        for string in ["gdp", "health", "urban", "health"]:
+            self.proxy.filter_mask([string])
+        self.assertEqual(list(self.proxy._cache_prefix), ["urban", "health"])
+        self.proxy.setSourceModel(_table_model(self.data[:10]))
+        self.assertEqual(len(self.proxy._cache_prefix), 0)
+
+
+class TestFilterMasks(ModelTestCase):
+    """Tests for combining filter strings with boolean masks."""
+
+    def test_fixed_strings(self):
+        """Test setting and changing a list of filter strings."""
+        for strings in [["gdp"], ["gdp", "health"], ["health", "urban"], []]:
+            self.proxy.setFilterFixedStrings(strings)
+            self.assertEqual(set(self.shown_ids()),
+                             self.ids_in_mask(self.brute_force_mask(strings)))
+        self.proxy.setFilterFixedStrings(["gdp", "health"])
+        first = self.proxy._cache_fixed
+        self.proxy.setFilterFixedStrings(["health"])
+        self.proxy.setFilterFixedStrings(["health", "gdp"])
+        self.assertIs(self.proxy._cache_fixed, first)
+
+    def test_cache_info(self):
+        """Test counting cached masks and their memory use."""
+        self.proxy.set_filter_result(
+            self.proxy.filter_mask(["gdp", "health"]))
+        info = self.proxy.cache_info()
+        self.assertEqual(info["strings"], 2)
+        self.assertEqual(info["recent"], 2)
+        self.assertEqual(info["bytes"], 2 * len(self.data))
+
+
+class TestFilterResult(ModelTestCase):
+    """Tests for applying filter results computed in the background."""
+
+    def test_worker_thread(self):
+        """Test applying a mask computed on another thread."""
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(self.proxy.filter_mask(["rural"])))
+        thread.start()
+        thread.join()
+        self.assertTrue(self.proxy.set_filter_result(results[0]))
+        self.assertEqual(set(self.shown_ids()),
+                         self.ids_in_mask(self.brute_force_mask(["rural"])))
+
+    def test_stale_result(self):
+        """Test that results for a previous source model are ignored."""
+        stale = self.proxy.filter_mask(["gdp"])
+        self.proxy.setSourceModel(_table_model(self.data[:50]))
+        self.assertFalse(self.proxy.set_filter_result(stale))
+        self.assertEqual(self.proxy.rowCount(), 50)
+        self.assertEqual(self.proxy._filter_strings, [])
+
+
+class TestIndicatorFacets(unittest.TestCase):
+    """Tests for topic, source and organization facets."""
+
+    def test_get_indicator_facets(self):
+        """Test that facets map values to indicator ids."""
+        facets = indicators_list.get_indicator_facets([
+            {"id": "A", "source": {"value": "WDI"},
+             "topics": [{"value": "Health "}, {"value": "Economy"}]},
+            {"id": "B", "source": {"value": "WDI"}, "topics": [{}],
+             "sourceOrganization": "World Bank"},
+            {"id": "C", "source": None, "topics": None},
+        ])
+        self.assertEqual(list(facets), indicators_list.FACETS)
+        self.assertEqual(facets["Topic"], {"Health": {"A"}, "Economy": {"A"}})
+        self.assertEqual(facets["Source"], {"WDI": {"A", "B"}})
+        self.assertEqual(facets["Organization"], {"World Bank": {"B"}})
+
+
+class TestIndicatorTableModel(ModelTestCase):
+    """Tests for the array backed indicator model."""
+
+    def test_data(self):
+        """Test cell values, links and filter text."""
+        model = indicators_list.IndicatorTableModel(
+            indicators_list.get_indicator_rows(self.data[:2]),
+            get_link="link:{}".format)
+        self.assertEqual(model.rowCount(), 2)
+        self.assertEqual(model.columnCount(), 5)
+        self.assertEqual(model.headerData(2, QtCore.Qt.Horizontal), "Name")
+        index = model.index(1, 1)
+        self.assertEqual(index.data(), self.data[1]["id"])
+        self.assertEqual(index.data(indicators_list.gui.LinkRole),
+                         "link:" + self.data[1]["id"])
+        self.assertEqual(model.index(1, 2).data(), self.data[1]["name"])
+        self.assertEqual(
+            model.index(1, 0).data(indicators_list.TEXTFILTERROLE),
+            model.filter_texts()[1])
+        self.assertIn(self.data[1]["name"].lower(), model.filter_texts()[1])
+        self.assertEqual(indicators_list.IndicatorTableModel([]).rowCount(),
+                         0)
+
+    def test_id_rows(self):
+        """Test finding rows of indicator ids."""
+        ids = [self.data[5]["id"], "missing", self.data[2]["id"]]
+        self.assertEqual(self.model.id_data_rows(ids), [5, 2])
+        self.model.sort(2)
+        self.assertEqual([self.model.index(row, 1).data()
+                          for row in self.model.id_rows(ids)],
+                         [ids[0], ids[2]])
+
+    def test_facet_mask(self):
+        """Test that facet and text filters are combined."""
+        selection = {"Topic": "Health", "Source": SOURCES[1]}
+        mask = self.model.facet_mask(selection)
+        expected = {
+            indicator["id"] for indicator in self.data
+            if {"value": "Health"} in indicator["topics"] and
+            indicator["source"]["value"] == SOURCES[1]
+        }
+        self.assertEqual(self.ids_in_mask(mask), expected)
+        self.assertIsNone(self.model.facet_mask({}))
+        self.assertEqual(self.model.facet_values()["Topic"], sorted(TOPICS))
+
+        self.proxy.set_facet_mask(mask)
+        self.proxy.set_filter_result(self.proxy.filter_mask(["gdp"]))
+        text_ids = self.ids_in_mask(self.brute_force_mask(["gdp"]))
+        self.assertEqual(set(self.shown_ids()), expected & text_ids)
+        self.proxy.set_facet_mask(None)
+        self.assertEqual(set(self.shown_ids()), text_ids)
+
+
+class TestSorting(ModelTestCase):
+    """Tests for sorting the indicator model with precomputed ranks."""
+
+    def column_values(self, column):
+        """Get values of a column in the displayed order."""
+        return [self.proxy.index(row, column).data()
+                for row in range(self.proxy.rowCount())]
+
+    def test_ranks(self):
+        """Test that all columns are ranked when the model is built."""
+        self.assertEqual(len(self.model._sort_ranks),
+                         len(self.model.HEADER))
+        ranks = self.model.sort_ranks(2)
+        self.assertFalse(ranks.flags.writeable)
+        self.assertEqual(sorted(ranks), list(range(len(self.data))))
+
+    def test_sort(self):
+        """Test sorting columns in both directions."""
+        ids = [indicator["id"] for indicator in self.data]
+        expected = sorted(ids, key=indicators_list._id_sort_key)
+        self.assertTrue(expected[0].startswith("GDS"))
+        self.proxy.sort(1, QtCore.Qt.AscendingOrder)
+        self.assertEqual(self.column_values(1), expected)
+        self.proxy.sort(1, QtCore.Qt.DescendingOrder)
+        self.assertEqual(self.column_values(1), expected[::-1])
+
+        names = sorted(indicator["name"] for indicator in self.data)
+        self.proxy.sort(2, QtCore.Qt.AscendingOrder)
+        self.assertEqual(self.column_values(2), names)
+        self.proxy.sort(2, QtCore.Qt.DescendingOrder)
+        self.assertEqual(self.column_values(2), names[::-1])
+
+        self.proxy.sort(-1)
+        self.assertEqual(self.column_values(2), names[::-1])
+
+    def test_sort_filtered(self):
+        """Test that sorting keeps the filter and persistent indexes."""
+        self.proxy.set_filter_result(self.proxy.filter_mask(["urban"]))
+        shown = set(self.shown_ids())
+        selection = QtGui.QItemSelectionModel(self.proxy)
+        selected = [self.proxy.index(row, 0) for row in (0, 3, 5)]
+        selected_ids = {self.proxy.index(index.row(), 1).data()
+                        for index in selected}
+        for index in selected:
+            selection.select(index, QtGui.QItemSelectionModel.Select |
+                             QtGui.QItemSelectionModel.Rows)
+        persistent = QtCore.QPersistentModelIndex(self.model.index(7, 1))
+        persistent_id = persistent.data()
+
+        for column, order in [(1, QtCore.Qt.AscendingOrder),
+                              (3, QtCore.Qt.DescendingOrder),
+                              (2, QtCore.Qt.AscendingOrder)]:
+            self.proxy.sort(column, order)
+            values = self.column_values(column)
+            key = indicators_list._id_sort_key if column == 1 else None
+            self.assertEqual(values, sorted(
+                values, key=key,
+                reverse=order == QtCore.Qt.DescendingOrder))
+            self.assertEqual(set(self.shown_ids()), shown)
+            self.assertEqual({index.data() for index
+                              in selection.selectedRows(1)}, selected_ids)
+            self.assertEqual(persistent.data(), persistent_id)
+
+    def test_sort_by_relevance(self):
+        """Test showing catalog search results in relevance order."""
+        ids = [self.data[9]["id"], self.data[4]["id"], "missing",
+               self.data[30]["id"]]
+        result = self.proxy.filter_ids(["pop"], ids)
+        self.assertEqual(result.ranked, [9, 4, 30])
+        self.proxy.set_filter_result(result)
+        self.assertEqual(self.shown_ids(), [ids[0], ids[1], ids[3]])
+        self.proxy.set_filter_result(self.proxy.filter_mask([]))
+        self.assertEqual(self.shown_ids()[:3], [ids[0], ids[1], ids[3]])
+        self.assertEqual(len(self.shown_ids()), len(self.data))
+
+
+class TestDescriptions(unittest.TestCase):
+    """Tests for incremental updates of indicator descriptions."""
+
+    def setUp(self):
+        self.data = _indicator_data(10)
+        self.ids = [indicator["id"] for indicator in self.data]
+
+    def _view(self):
+        view = _tree_view()
+        view._indicator_data = {ind["id"]: ind for ind in self.data}
+        return view
+
+    @staticmethod
+    def _text(view):
+        return view._main_widget.indicator_description.toPlainText()
+
+    def test_updates(self):
+        """Test that incremental updates match a full render."""
+        view = self._view()
+        ids = self.ids
+        for selection in [[0], [0, 1, 2], [2, 0], [3, 2, 0, 1], [1, 0],
+                          [], [4], [5, 4, 6], [6, 5, 4]]:
+            shown = [ids[index] for index in selection]
+            view._show_descriptions(shown)
+            fresh = self._view()
+            fresh._show_descriptions(shown)
+            self.assertEqual(self._text(view), self._text(fresh))
+            self.assertEqual(re.findall(r"ID: (\S+)", self._text(view)),
+                             shown)
+            self.assertEqual(set(view._description_frames), set(shown))
+
+    def test_cached_descriptions(self):
+        """Test that descriptions are generated once per indicator."""
+        view = self._view()
+        with mock.patch.object(view, "_generate_description",
+                               wraps=view._generate_description) as generate:
+            view._show_descriptions(self.ids[:2])
+            view._show_descriptions(self.ids[1:3])
+            view._show_descriptions(self.ids[:3])
+        self.assertEqual(generate.call_count, 3)
+
+
+class TestCatalogUpdate(unittest.TestCase):
+    """Tests for keeping the indicator catalog up to date."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.catalog = catalog.IndicatorCatalog(
+            os.path.join(directory, "indicators.sqlite"))
+        snapshots = cache.ResponseCache("snapshots", cache_dir=directory)
+        for patcher in [
+                mock.patch.object(catalog, "get_catalog",
+                                  return_value=self.catalog),
+                mock.patch.object(cache, "get_snapshot_cache",
+                                  return_value=snapshots)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.data = _indicator_data(20)
+        self.view = _tree_view()
+        self.view._api.get_indicators = lambda filter_: self.data
+
+    def test_incomplete_catalog(self):
+        """Test that an unchanged list still completes the catalog."""
+        self.catalog.update(self.data[:5])
+        self.assertIsNone(
+            self.view._fetch_indicators("All", snapshot=self.data))
+        self.assertEqual(len(self.catalog), len(self.data))
+
+    def test_other_lists(self):
+        """Test that an unchanged list of some indicators is not stored."""
+        self.catalog.update(self.data[:5])
+        self.view._fetch_indicators("Common", snapshot=self.data)
+        self.assertEqual(len(self.catalog), 5)
@@ -2,12 +2,18 @@
 
 # pylint: disable=protected-access
 
+import os
+import shutil
+import tempfile
 import unittest
 import time
+from unittest import mock
 
 from PyQt4 import QtTest
 from PyQt4 import QtCore
 
+from orangecontrib.wbd import catalog
+from orangecontrib.wbd import indicators_list
 from orangecontrib.wbd.widgets import owworldbankindicators
 from Orange.widgets.utils import concurrent
 # from concurrent.futures import wait
@@ -44,6 +50,44 @@ class TestWorldBankDataWidget(unittest.TestCase):
         """Test calling callbacks on return press in the filter_text."""
         widget = owworldbankindicators.OWWorldBankIndicators()
         futures = widget._executor._futures + \
+            widget._interactive_executor._futures + \
             widget.indicator_widget._executor._futures
         self._busy_wait(futures)
         QtTest.QTest.keyPress(widget.filter_text, QtCore.Qt.Key_Return)
+
+
+class TestCatalogFilter(unittest.TestCase):
+    """Tests for filtering the list of all indicators with the catalog."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.data = [
+            {"id": "SP.POP.TOTL", "name": "Population, total"},
+            {"id": "NY.GDP.MKTP.CD", "name": "GDP (current US$)"},
+        ]
+        indicator_catalog = catalog.IndicatorCatalog(
+            os.path.join(self.directory, "indicators.sqlite"))
+        indicator_catalog.update(self.data)
+        patcher = mock.patch.object(catalog, "get_catalog",
+                                    return_value=indicator_catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.proxy = indicators_list.MySortFilterProxyModel()
+        self.proxy.setSourceModel(indicators_list.IndicatorTableModel(
+            indicators_list.get_indicator_rows(self.data)))
+        if not indicator_catalog.has_fts:
+            self.skipTest("SQLite has no full text search.")
+
+    def test_word_prefix(self):
+        """Test that word prefixes are searched in the catalog."""
+        result = owworldbankindicators.OWWorldBankIndicators._catalog_filter(
+            self.proxy, ("popul",))
+        self.assertEqual(result.ranked, [0])
+
+    def test_substring_fallback(self):
+        """Test that parts of words are found with substring matching."""
+        result = owworldbankindicators.OWWorldBankIndicators._catalog_filter(
+            self.proxy, ("ulation",))
+        self.assertIsNone(result.ranked)
+        self.assertEqual(result.mask.tolist(), [True, False])
@@ -0,0 +1,38 @@
+"""Tests for the shared fetch scheduler."""
+
+import threading
+import unittest
+
+from orangecontrib.wbd import scheduler
+
+
+class TestFetchScheduler(unittest.TestCase):
+    """Tests for bulk limits and queue statistics."""
+
+    def test_bulk_limit(self):
+        """Test that bulk tasks leave a thread free for interactive tasks."""
+        fetch_scheduler = scheduler.FetchScheduler(max_threads=2)
+        bulk_executor = fetch_scheduler.executor(scheduler.BULK)
+        interactive_executor = fetch_scheduler.executor(scheduler.INTERACTIVE)
+        started = threading.Event()
+        release = threading.Event()
+
+        def bulk_task():
+            started.set()
+            release.wait(5)
+
+        bulk_futures = [bulk_executor.submit(bulk_task) for _ in range(3)]
+        started.wait(5)
+        interactive = interactive_executor.submit(lambda: "done")
+        self.assertEqual(interactive.result(timeout=5), "done")
+
+        stats = fetch_scheduler.stats()
+        self.assertEqual(stats["running"]["bulk"], 1)
+        self.assertEqual(stats["queued"]["bulk"], 2)
+        self.assertEqual(fetch_scheduler.queue_depth(), 2)
+
+        release.set()
+        for future in bulk_futures:
+            future.result(timeout=5)
+        fetch_scheduler.pool.waitForDone()
+        self.assertEqual(fetch_scheduler.queue_depth(), 0)
@@ -0,0 +1,107 @@
+"""Tests for shared transport helpers."""
+
+# pylint: disable=protected-access
+
+import time
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+from orangecontrib.wbd import transport
+
+
+class TestServerStatus(unittest.TestCase):
+    """Tests for cached server status checks."""
+
+    URL = "http://status.example.com"
+
+    def tearDown(self):
+        transport._status.pop(self.URL, None)
+
+    def test_connection_error(self):
+        """Test that connection errors mark the server as down."""
+        session = mock.Mock()
+        session.get.side_effect = requests.exceptions.ConnectionError()
+        with mock.patch.object(transport, "get_session",
+                               return_value=session):
+            self.assertIsNone(transport.get_cached_status(self.URL))
+            self.assertEqual(transport.check_status(self.URL), "Down")
+            self.assertEqual(transport.check_status(self.URL), "Down")
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(transport.get_cached_status(self.URL), "Down")
+
+    def test_expiry(self):
+        """Test that the status is checked again after STATUS_TTL."""
+        session = mock.Mock()
+        with mock.patch.object(transport, "get_session",
+                               return_value=session), \
+                mock.patch.object(transport, "STATUS_TTL", 0):
+            self.assertEqual(transport.check_status(self.URL), "Up")
+            self.assertEqual(transport.check_status(self.URL), "Up")
+        self.assertEqual(session.get.call_count, 2)
+
+
+class TestHostSlots(unittest.TestCase):
+    """Tests for per host request limits."""
+
+    def test_interactive_priority(self):
+        """Test that interactive requests get a free slot first."""
+        slots = transport.HostSlots(1)
+        slots.acquire()
+        order = []
+
+        def request(priority):
+            with slots.slot(priority):
+                order.append(priority)
+
+        bulk = threading.Thread(target=request, args=(transport.BULK,))
+        bulk.start()
+        self._wait_for_waiting(slots, transport.BULK)
+        interactive = threading.Thread(target=request,
+                                       args=(transport.INTERACTIVE,))
+        interactive.start()
+        self._wait_for_waiting(slots, transport.INTERACTIVE)
+        slots.release()
+        bulk.join(5)
+        interactive.join(5)
+        self.assertEqual(order, [transport.INTERACTIVE, transport.BULK])
+        self.assertEqual(slots._active, 0)
+
+    @staticmethod
+    def _wait_for_waiting(slots, priority):
+        for _ in range(500):
+            with slots._condition:
+                if slots._waiting[priority]:
+                    return
+            time.sleep(0.01)
+
+
+class TestFetch(unittest.TestCase):
+    """Tests for fetching responses with the shared session."""
+
+    URL = "http://fetch.example.com/data"
+
+    def _fetch(self, status_code, text="[1, 2]"):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = text.encode("utf-8")
+        session = mock.Mock()
+        session.get.return_value = response
+        with mock.patch.object(transport, "get_session",
+                               return_value=session):
+            return transport.fetch_json(self.URL), session
+
+    def test_fetch(self):
+        """Test that requests are sent with the default timeout."""
+        data, session = self._fetch(200)
+        self.assertEqual(data, [1, 2])
+        session.get.assert_called_once_with(
+            self.URL, timeout=transport.FETCH_TIMEOUT)
+
+    def test_error_status(self):
+        """Test that error pages raise HTTP errors instead of parse errors."""
+        self.assertRaises(requests.exceptions.HTTPError, self._fetch, 503,
+                          "<html>Service unavailable</html>")
+        self.assertEqual(transport.host_slots(self.URL)._active, 0)